@@ -1,18 +1,36 @@
 
 
 # app.py
-from fastapi import FastAPI, HTTPException, Depends
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional
-from scraper import scrape_shopify_store
-from database import SessionLocal, BrandData, CompetitorData
-from sqlalchemy.orm import Session
-from competitor import get_competitors
-import json
-from fastapi.responses import Response
+from typing import List, Optional
+from database import AsyncSessionLocal, async_engine, BrandData, CompetitorData, ScrapeJob, BrandProduct, BrandSocialHandle
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+from insights import aiter_batch_insights, aiter_insights_events, ashared_insights, cached_insights, public_result
+from jobs import submit_job, submit_refresh, job_to_dict, worker_pool
+from llm_cache import llm_cache
+import llm_client
+from http_cache import page_cache
+from http_client import host_scheduler
+from serialization import decode_blob, dumps
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-app = FastAPI(title="Shopify Insights Fetcher")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    worker_pool.start()
+    yield
+    worker_pool.stop()
+    await async_engine.dispose()
+
+app = FastAPI(title="Shopify Insights Fetcher", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,59 +42,63 @@ app.add_middleware(
 class UrlRequest(BaseModel):
     website_url: str
     include_competitors: Optional[bool] = False
+    async_job: Optional[bool] = False  # queue the request and return a job id immediately
+    incremental: Optional[bool] = True  # reuse stored results for sections that did not change
+    max_age: Optional[float] = None  # seconds; serve the stored result if it is at most this old
+    force_refresh: Optional[bool] = False  # always scrape, ignoring max_age
 
-def get_db():
-    db = SessionLocal()
-    try:
+class BatchRequest(BaseModel):
+    website_urls: List[str]
+    concurrency: Optional[int] = None  # stores scraped at once, capped at BATCH_MAX_CONCURRENCY
+    incremental: Optional[bool] = True
+    skip_fresher_than: Optional[float] = None  # seconds; skip stores scraped this recently (resume)
+    include_data: Optional[bool] = False  # full results instead of one summary line per store
+
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "1000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+# With max_age, a result older than max_age but within this many extra seconds is
+# served immediately while a background job refreshes it
+INSIGHTS_MAX_STALE = float(os.getenv("INSIGHTS_MAX_STALE", "604800"))
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @app.post("/insights")
-def get_insights(request: UrlRequest, db: Session = Depends(get_db)):
+async def get_insights(request: UrlRequest, pretty: bool = False, db: AsyncSession = Depends(get_db)):
+    if request.async_job:
+        job = await db.run_sync(submit_job, request.website_url, request.include_competitors)
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
+        )
+
+    if request.max_age is not None and not request.force_refresh:
+        cached = await db.run_sync(cached_insights, request.website_url, request.include_competitors)
+        if cached:
+            response_data, age = cached
+            if age <= request.max_age:
+                state = "fresh"
+            elif age <= request.max_age + INSIGHTS_MAX_STALE:
+                state = "stale"
+                await db.run_sync(submit_refresh, request.website_url, request.include_competitors)
+            else:
+                state = None
+            if state:
+                return Response(content=dumps(response_data, pretty=pretty), media_type="application/json",
+                                headers={"X-Cache": state, "Age": str(int(age))})
+
     try:
-        result = scrape_shopify_store(request.website_url)
-        if "error" in result:
-            raise HTTPException(status_code=result.get("status_code", 500), detail=result["error"])
-
-        # Save to DB
-        existing = db.query(BrandData).filter(BrandData.website == result["website"]).first()
-        if existing:
-            existing.data = json.dumps(result)
-        else:
-            db.add(BrandData(website=result["website"], data=json.dumps(result)))
-        db.commit()
-
-        response_data = {"brand": result}
-
-        if request.include_competitors:
-            comp_data = []
-            for comp_url in get_competitors(request.website_url):
-                comp_result = scrape_shopify_store(comp_url)
-                if "error" not in comp_result:
-                    # Check if competitor already exists
-                    existing_comp = db.query(CompetitorData).filter(
-                        CompetitorData.brand_website == result["website"],
-                        CompetitorData.competitor_website == comp_result["website"]
-                    ).first()
-                    
-                    if existing_comp:
-                        existing_comp.data = json.dumps(comp_result)
-                    else:
-                        db.add(CompetitorData(
-                            brand_website=result["website"],
-                            competitor_website=comp_result["website"],
-                            data=json.dumps(comp_result)
-                        ))
-                    comp_data.append(comp_result)
-            db.commit()
-            response_data["competitors"] = comp_data
-
-        # Return proper JSON response
-        return Response(
-            content=json.dumps(response_data, indent=2, ensure_ascii=False),
-            media_type="application/json"
+        # Concurrent requests for the same store share one scrape
+        response_data = await ashared_insights(
+            request.website_url, request.include_competitors, incremental=request.incremental
         )
+        if "error" in response_data:
+            raise HTTPException(status_code=response_data.get("status_code", 500), detail=response_data["error"])
+
+        # Compact by default; ?pretty=1 for indented output
+        return Response(content=dumps(response_data, pretty=pretty), media_type="application/json")
 
     except HTTPException:
         raise
@@ -84,31 +106,199 @@ def get_insights(request: UrlRequest, db: Session = Depends(get_db)):
         print(f"💥 Unexpected error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/insights/stream")
+async def stream_insights(request: UrlRequest, format: str = Query("ndjson", pattern="^(ndjson|sse)$")):
+    """POST /insights, streamed: each brand section is sent as soon as it is scraped.
+
+    Events are "section" (brand_name, social_handles, contact_info, products,
+    hero_products, policies, faqs, about_brand, important_links), "stage",
+    and finally "result" with the saved payload or "error". format=sse sends
+    them as server-sent events instead of NDJSON lines.
+    """
+    async def events():
+        async for event in aiter_insights_events(request.website_url, request.include_competitors,
+                                                 incremental=request.incremental):
+            if format == "sse":
+                yield f"event: {event['event']}\ndata: ".encode("utf-8") + dumps(event) + b"\n\n"
+            else:
+                yield dumps(event) + b"\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@app.post("/insights/batch")
+async def get_batch_insights(request: BatchRequest):
+    """Scrape and save many stores, streaming one NDJSON line per store as each finishes"""
+    if not request.website_urls:
+        raise HTTPException(status_code=400, detail="website_urls is empty")
+    if len(request.website_urls) > BATCH_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_URLS} URLs per batch")
+    concurrency = max(1, min(request.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+
+    async def lines():
+        async for line in aiter_batch_insights(request.website_urls, concurrency, request.incremental,
+                                               request.skip_fresher_than, request.include_data):
+            yield dumps(line) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Get status, per-stage progress and result of a queued insights job"""
+    job = await db.get(ScrapeJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+@app.get("/stats/llm-cache")
+def get_llm_cache_stats():
+    """Hit/miss statistics for the LLM result cache"""
+    return llm_cache.stats()
+
+@app.get("/stats/llm-limits")
+def get_llm_limit_stats():
+    """Remaining budget in the LLM request and token buckets"""
+    return llm_client.stats()
+
+@app.get("/stats/page-cache")
+def get_page_cache_stats():
+    """Revalidation and size statistics for the on-disk page cache"""
+    return page_cache.stats()
+
+@app.get("/stats/http-hosts")
+def get_http_host_stats():
+    """Hosts the request scheduler is currently slowing down for, with their spacing"""
+    return host_scheduler.stats()
+
+# Pagination and projection for the list endpoints
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 1000
+STREAM_BATCH_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-After-Id"
+
+# Computed fields accepted by fields=, mapped to the list they count
+COUNT_FIELDS = {
+    "product_count": "products",
+    "hero_product_count": "hero_products",
+    "faq_count": "faqs",
+    "social_count": "social_handles",
+    "important_link_count": "important_links",
+}
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split a comma separated fields= value; None means the full data blob"""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()]
+
+def needs_data(fields: Optional[List[str]], row_columns) -> bool:
+    """False when fields= names only row columns, so the data blob need not be read"""
+    return fields is None or any(field not in row_columns for field in fields)
+
+def project_data(raw: Optional[str], fields: Optional[List[str]], website: str) -> dict:
+    """The fields of a stored data blob; a blob that cannot be decoded becomes an error marker"""
+    try:
+        data = public_result(decode_blob(raw)) or {}
+    except ValueError as e:
+        logger.error(f"Cannot decode stored data for {website}: {e}")
+        return {"error": "Stored data could not be decoded"}
+    if fields is None:
+        return data
+    projected = {}
+    for field in fields:
+        if field in COUNT_FIELDS:
+            projected[field] = len(data.get(COUNT_FIELDS[field]) or [])
+        elif field in data:
+            projected[field] = data[field]
+    return projected
+
+async def list_response(stmt, id_column, serialize, limit: Optional[int], after_id: int,
+                        format: str, db: AsyncSession):
+    """Keyset-paginated list as a JSON array, or every remaining row as streamed NDJSON.
+
+    JSON pages carry the cursor for the next page in the X-Next-After-Id header.
+    """
+    stmt = stmt.where(id_column > after_id).order_by(id_column)
+    if format == "ndjson":
+        if limit:
+            stmt = stmt.limit(limit)
+
+        async def generate():
+            # The request session is closed before the body is streamed, so use our own
+            async with AsyncSessionLocal() as stream_db:
+                result = await stream_db.stream_scalars(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+                async for row in result:
+                    yield dumps(serialize(row)) + b"\n"
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    limit = min(limit or LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT)
+    rows = (await db.scalars(stmt.limit(limit))).all()
+    headers = {NEXT_CURSOR_HEADER: str(rows[-1].id)} if len(rows) == limit else {}
+    return Response(content=dumps([serialize(row) for row in rows]), media_type="application/json", headers=headers)
+
 @app.get("/brands")
-def get_all_brands(db: Session = Depends(get_db)):
-    """Get all stored brand data"""
-    brands = db.query(BrandData).all()
-    return [
-        {
-            "id": brand.id,
-            "website": brand.website,
-            "data": json.loads(brand.data) if brand.data else {}
-        }
-        for brand in brands
-    ]
+async def get_all_brands(limit: Optional[int] = Query(None, ge=1), after_id: int = 0,
+                         fields: Optional[str] = None, format: str = Query("json", pattern="^(json|ndjson)$"),
+                         db: AsyncSession = Depends(get_db)):
+    """Get stored brand data, one page at a time.
+
+    fields: comma separated data keys and/or counts (e.g. brand_name,product_count).
+    format=ndjson streams every brand after after_id, one JSON object per line.
+    """
+    field_list = parse_fields(fields)
+    with_data = needs_data(field_list, ("id", "website"))
+
+    stmt = select(BrandData)
+    if not with_data:
+        stmt = stmt.options(defer(BrandData.data))
+
+    def serialize(brand: BrandData) -> dict:
+        row = {"id": brand.id, "website": brand.website}
+        if with_data:
+            row["data"] = project_data(brand.data, field_list, brand.website)
+        return row
+
+    return await list_response(stmt, BrandData.id, serialize, limit, after_id, format, db)
+
+@app.get("/brands/search")
+async def search_brands(max_price: Optional[float] = None, platform: Optional[str] = None,
+                        limit: Optional[int] = Query(None, ge=1), after_id: int = 0,
+                        format: str = Query("json", pattern="^(json|ndjson)$"),
+                        db: AsyncSession = Depends(get_db)):
+    """Find brands with a product under max_price and/or a social handle on platform (e.g. "tiktok").
+
+    Paged like /brands; platform is matched case-insensitively.
+    """
+    stmt = select(BrandData).options(defer(BrandData.data))
+    if max_price is not None:
+        stmt = stmt.where(exists().where(BrandProduct.brand_id == BrandData.id, BrandProduct.price < max_price))
+    if platform:
+        stmt = stmt.where(exists().where(
+            BrandSocialHandle.brand_id == BrandData.id, func.lower(BrandSocialHandle.platform) == platform.lower()
+        ))
+
+    def serialize(brand: BrandData) -> dict:
+        return {"id": brand.id, "website": brand.website}
+
+    return await list_response(stmt, BrandData.id, serialize, limit, after_id, format, db)
 
 @app.get("/competitors/{brand_website}")
-def get_competitors_for_brand(brand_website: str, db: Session = Depends(get_db)):
-    """Get all competitors for a specific brand"""
-    competitors = db.query(CompetitorData).filter(
-        CompetitorData.brand_website == brand_website
-    ).all()
-    return [
-        {
-            "id": comp.id,
-            "brand_website": comp.brand_website,
-            "competitor_website": comp.competitor_website,
-            "data": json.loads(comp.data) if comp.data else {}
-        }
-        for comp in competitors
-    ]
\ No newline at end of file
+async def get_competitors_for_brand(brand_website: str, limit: Optional[int] = Query(None, ge=1),
+                                    after_id: int = 0, fields: Optional[str] = None,
+                                    format: str = Query("json", pattern="^(json|ndjson)$"),
+                                    db: AsyncSession = Depends(get_db)):
+    """Get competitors for a specific brand; paging and fields= work as for /brands"""
+    field_list = parse_fields(fields)
+    with_data = needs_data(field_list, ("id", "brand_website", "competitor_website"))
+
+    stmt = select(CompetitorData).where(CompetitorData.brand_website == brand_website)
+    if not with_data:
+        stmt = stmt.options(defer(CompetitorData.data))
+
+    def serialize(comp: CompetitorData) -> dict:
+        row = {"id": comp.id, "brand_website": comp.brand_website, "competitor_website": comp.competitor_website}
+        if with_data:
+            row["data"] = project_data(comp.data, field_list, comp.competitor_website)
+        return row
+
+    return await list_response(stmt, CompetitorData.id, serialize, limit, after_id, format, db)
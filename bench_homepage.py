@@ -0,0 +1,134 @@
+# bench_homepage.py
+"""Compare the single-pass homepage extractor with the old multi-pass extraction,
+and the BeautifulSoup parser backend with the lxml event backend.
+
+Usage: python bench_homepage.py [--repeat N] [--products N] [page.html ...]
+
+Without files a synthetic Shopify-like homepage is generated. All
+implementations must produce the same links, socials, product links and
+text; the script exits non-zero if they differ.
+"""
+import argparse
+import re
+import sys
+import time
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from html_extract import SOCIAL_PATTERNS, clean_text, extract_page, extract_page_lxml
+
+BASE_URL = "https://bench-store.myshopify.com"
+
+
+def synthetic_homepage(products: int) -> str:
+    nav = "".join(f'<li><a href="/collections/c{i}">Collection {i}</a></li>' for i in range(60))
+    cards = "".join(
+        f'<div class="card"><a href="/products/item-{i}?variant={i}"><img src="/cdn/{i}.jpg">'
+        f'<span>Item {i}</span></a><p>Soft cotton tee number {i}. Contact  sales{i % 7}@store.com '
+        f'or call +1 555-010-{i % 10000:04d}</p><script>window.v{i}={{"id":{i}}}</script></div>'
+        for i in range(products)
+    )
+    footer = "".join(
+        f'<a href="https://www.{site}.com/benchstore">{site}</a>'
+        for site in ("instagram", "facebook", "tiktok", "twitter", "youtube", "pinterest")
+    )
+    links = "".join(
+        f'<a href="/pages/{slug}">{text}</a>'
+        for slug, text in (("faq", "FAQ"), ("about", "About Us"), ("privacy", "Privacy Policy"),
+                           ("refund", "Refund Policy"), ("contact", "Contact Us"), ("track", "Track Order"))
+    )
+    return (
+        '<html><head><title>Bench Store | Home</title><meta property="og:site_name" content="Bench Store">'
+        '<style>.card{color:red}</style></head><body>'
+        f'<header><nav><ul>{nav}</ul></nav></header><main>{cards}</main>'
+        f'<section>{links}</section><footer>{footer}</footer></body></html>'
+    )
+
+
+def legacy_extract(soup: BeautifulSoup, base_url: str) -> dict:
+    """The extraction scrape_shopify_store did before the single-pass extractor"""
+    links = {}
+    for a in soup.find_all('a', href=True):
+        text = a.get_text().strip().lower()
+        if text and len(text) < 100:
+            links[text] = urljoin(base_url, a.get('href', ''))
+    socials = []
+    seen_urls = set()
+    for a in soup.find_all("a", href=True):
+        href = a.get('href', '')
+        if href and href not in seen_urls:
+            for pattern, platform in SOCIAL_PATTERNS.items():
+                if re.search(pattern, href, re.IGNORECASE):
+                    seen_urls.add(href)
+                    socials.append({"platform": platform, "url": href})
+                    break
+    product_hrefs = [link.get('href', '') for link in soup.find_all("a", href=re.compile(r"/products/"))]
+    title_tag = soup.find("title")
+    title = title_tag.text if title_tag else None
+    og_site = soup.find("meta", property="og:site_name")
+    texts = []
+    for _ in range(2):  # FAQ fallback and contact extraction each cleaned the page
+        for tag in soup(["script", "style", "nav", "header", "footer"]):
+            tag.decompose()
+        texts.append(clean_text(soup.get_text()))
+    return {"links": links, "socials": socials, "product_hrefs": product_hrefs, "text": texts[0],
+            "title": title, "og_site_name": (og_site.get("content") or "") if og_site else None}
+
+
+def single_pass_extract(soup: BeautifulSoup, base_url: str) -> dict:
+    return as_dict(extract_page(soup, base_url))
+
+
+def as_dict(page) -> dict:
+    return {"links": page.links, "socials": page.socials, "product_hrefs": page.product_hrefs,
+            "text": page.text, "title": page.title, "og_site_name": page.og_site_name}
+
+
+def bench(name: str, html: bytes, repeat: int) -> bool:
+    # Parsing is identical for both and excluded; each run gets a fresh tree
+    # because the legacy path destroys the one it is given
+    soups = [BeautifulSoup(html, "lxml") for _ in range(2 * repeat)]
+    start = time.perf_counter()
+    legacy = [legacy_extract(soup, BASE_URL) for soup in soups[:repeat]][0]
+    legacy_time = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    single = [single_pass_extract(soup, BASE_URL) for soup in soups[repeat:]][0]
+    single_time = (time.perf_counter() - start) / repeat
+
+    # Parse + extract: BeautifulSoup tree vs lxml parse events
+    start = time.perf_counter()
+    for _ in range(repeat):
+        single_pass_extract(BeautifulSoup(html, "lxml"), BASE_URL)
+    bs4_time = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    events = [as_dict(extract_page_lxml(html, BASE_URL)) for _ in range(repeat)][0]
+    lxml_time = (time.perf_counter() - start) / repeat
+
+    print(f"{name}: {len(html) / 1024:.0f} KiB, {len(single['links'])} links, {len(single['product_hrefs'])} product links")
+    print("  extraction only:")
+    print(f"    multi-pass        {legacy_time * 1000:8.1f} ms")
+    print(f"    single-pass       {single_time * 1000:8.1f} ms  ({legacy_time / single_time:.2f}x)")
+    print("  parse + extract:")
+    print(f"    bs4 tree          {bs4_time * 1000:8.1f} ms")
+    print(f"    lxml events       {lxml_time * 1000:8.1f} ms  ({bs4_time / lxml_time:.2f}x)")
+    same = True
+    for label, result in (("single-pass", single), ("lxml events", events)):
+        for key in legacy:
+            if legacy[key] != result[key]:
+                print(f"  {label} differs: {key}")
+                same = False
+    print(f"  identical output: {same}")
+    return same
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="saved homepage HTML files")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--products", type=int, default=2000, help="product cards in the synthetic page")
+    args = parser.parse_args()
+
+    pages = [(path, open(path, "rb").read()) for path in args.files]
+    if not pages:
+        pages = [(f"synthetic ({args.products} products)", synthetic_homepage(args.products).encode("utf-8"))]
+    ok = all([bench(name, html, args.repeat) for name, html in pages])
+    sys.exit(0 if ok else 1)
@@ -179,45 +179,101 @@ if fetch_button and not url_input:
     st.markdown('<div class="error-alert">⚠️ Please enter a store URL to continue</div>', unsafe_allow_html=True)
     st.stop()
 
+# Sections /insights/stream sends before the final result, in the order they usually arrive
+STREAM_SECTIONS = [
+    "brand_name", "social_handles", "contact_info", "products", "hero_products",
+    "privacy_policy", "return_refund_policy", "faqs", "about_brand", "important_links"
+]
+
+def render_preview(sections):
+    """Partial results shown while the scrape is still running"""
+    if "brand_name" in sections:
+        st.header(f"🏪 {sections['brand_name']}")
+    preview_cols = st.columns(4)
+    with preview_cols[0]:
+        st.metric("Products Found", len(sections["products"]) if "products" in sections else "…")
+    with preview_cols[1]:
+        st.metric("FAQs Extracted", len(sections["faqs"]) if "faqs" in sections else "…")
+    with preview_cols[2]:
+        st.metric("Social Channels", len(sections["social_handles"]) if "social_handles" in sections else "…")
+    with preview_cols[3]:
+        contact = sections.get("contact_info")
+        st.metric("Contact Methods", len(contact["emails"]) + len(contact["phones"]) if contact else "…")
+    if sections.get("hero_products"):
+        st.markdown("**⭐ Featured:** " + ", ".join(p["title"] for p in sections["hero_products"][:5]))
+    if "about_brand" in sections:
+        st.markdown(f"**📖 About:** {sections['about_brand'][:300]}")
+    pending = [name.replace("_", " ") for name in STREAM_SECTIONS if name not in sections]
+    if pending:
+        st.caption("⏳ Still working on: " + ", ".join(pending))
+
 # Main processing
 if fetch_button and url_input:
     # Progress tracking
     progress_bar = st.progress(0)
     status_text = st.empty()
+    preview = st.empty()
     
     try:
-        # Step 1: Initial request
         status_text.text("🔍 Analyzing store structure...")
-        progress_bar.progress(20)
         
+        # Sections are rendered as the backend finishes them
         response = requests.post(
-            "http://127.0.0.1:8000/insights",
+            "http://127.0.0.1:8000/insights/stream",
             json={"website_url": url_input.strip(), "include_competitors": include_comp},
-            timeout=120  # Increased timeout for competitor analysis
+            stream=True,
+            timeout=120  # Longest wait for the next section (competitor analysis takes longer)
         )
         
+        status_code = response.status_code
+        result = None
+        error_detail = None
+        if status_code == 200:
+            sections = {}
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["event"] == "section":
+                    sections[event["section"]] = event["data"]
+                    progress_bar.progress(int(90 * len([s for s in STREAM_SECTIONS if s in sections]) / len(STREAM_SECTIONS)))
+                    status_text.text(f"🔍 Got {event['section'].replace('_', ' ')}...")
+                    with preview.container():
+                        render_preview(sections)
+                elif event["event"] == "stage" and event["stage"] == "save_brand" and event["state"] == "running":
+                    status_text.text("💾 Saving results...")
+                elif event["event"] == "result":
+                    result = event["data"]
+                elif event["event"] == "error":
+                    status_code = event.get("status_code", 500)
+                    error_detail = event["error"]
+            if result is None and error_detail is None:
+                status_code, error_detail = 500, "The analysis stopped before finishing"
+        else:
+            error_detail = response.json().get('detail', 'Unknown error occurred')
+        
         progress_bar.progress(100)
-        status_text.text("✅ Analysis complete!")
+        status_text.text("✅ Analysis complete!" if result is not None else "❌ Analysis failed")
         time.sleep(1)
         status_text.empty()
         progress_bar.empty()
+        preview.empty()
         
-        if response.status_code == 200:
+        if result is not None:
             # Store data in session state
-            st.session_state.analysis_data = response.json()
+            st.session_state.analysis_data = result
             st.session_state.last_analyzed_url = url_input.strip()
             st.session_state.analysis_timestamp = datetime.now()
             
             st.success("✅ Analysis completed successfully! Data has been stored and will persist during your session.")
             
         else:
-            error_detail = response.json().get('detail', 'Unknown error occurred')
-            st.markdown(f'<div class="error-alert">❌ Error {response.status_code}: {error_detail}</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="error-alert">❌ Error {status_code}: {error_detail}</div>', unsafe_allow_html=True)
             
             # Provide helpful suggestions based on error
-            if response.status_code == 404:
+            if status_code == 404:
                 st.info("💡 **Suggestions:**\n- Check if the URL is correct\n- Ensure the website is accessible\n- Try adding 'https://' prefix")
-            elif response.status_code == 500:
+            elif status_code == 500:
                 st.info("💡 **Suggestions:**\n- The website might be blocking automated requests\n- Try again in a few minutes\n- Contact support if the issue persists")
 
     except requests.exceptions.Timeout:
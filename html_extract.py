@@ -0,0 +1,292 @@
+# html_extract.py
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+from bs4.dammit import EncodingDetector
+from bs4.element import RubyParenthesisString, RubyTextString, Script, Stylesheet, TemplateString
+from lxml import etree
+
+# Elements whose text is left out of the page's clean text
+HIDDEN_TAGS = frozenset(["script", "style", "nav", "header", "footer"])
+
+# Only plain text nodes count as text (same rule as BeautifulSoup.get_text())
+TEXT_TYPES = (NavigableString, CData)
+# Strings BeautifulSoup keeps under STRING_CONTAINER_TAGS; passed on so JSON-LD can be read
+CONTAINER_TYPES = (Script, Stylesheet, TemplateString, RubyTextString, RubyParenthesisString)
+
+# BeautifulSoup gives strings under these their own string classes, which get_text() skips
+STRING_CONTAINER_TAGS = frozenset(["script", "style", "template", "rt", "rp"])
+PRESERVE_WHITESPACE_TAGS = frozenset(["pre", "textarea"])
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+# (hidden, container, preserve) increments for the few tags that change them;
+# every other tag skips the counter updates
+_TAG_FLAGS = {
+    tag: (tag in HIDDEN_TAGS, tag in STRING_CONTAINER_TAGS, tag in PRESERVE_WHITESPACE_TAGS)
+    for tag in HIDDEN_TAGS | STRING_CONTAINER_TAGS | PRESERVE_WHITESPACE_TAGS
+}
+
+SOCIAL_PATTERNS = {
+    r'instagram\.com': 'Instagram',
+    r'facebook\.com': 'Facebook',
+    r'tiktok\.com': 'TikTok',
+    r'twitter\.com': 'Twitter',
+    r'youtube\.com': 'YouTube',
+    r'linkedin\.com': 'LinkedIn',
+    r'pinterest\.com': 'Pinterest'
+}
+_SOCIAL_RE = [(re.compile(pattern, re.IGNORECASE), platform) for pattern, platform in SOCIAL_PATTERNS.items()]
+# One search rules out the common case of a URL matching no platform
+_ANY_SOCIAL_RE = re.compile("|".join(SOCIAL_PATTERNS), re.IGNORECASE)
+
+MAX_LINK_TEXT = 100  # Avoid very long link texts
+
+
+def social_platform(url: str) -> Optional[str]:
+    """Platform name for a social profile URL, or None"""
+    if not _ANY_SOCIAL_RE.search(url):
+        return None
+    for pattern, platform in _SOCIAL_RE:
+        if pattern.search(url):
+            return platform
+    return None
+
+
+@dataclass
+class PageExtract:
+    """Everything the scraper reads from one parsed page"""
+    links: Dict[str, str] = field(default_factory=dict)  # lower-cased link text -> absolute URL
+    socials: List[Dict[str, str]] = field(default_factory=list)  # {"platform", "url"} in page order
+    product_hrefs: List[str] = field(default_factory=list)  # hrefs containing /products/
+    text: str = ""
+    title: Optional[str] = None
+    og_site_name: Optional[str] = None
+    # Structured data, read by structured_data.py
+    json_ld: List[Any] = field(default_factory=list)  # parsed application/ld+json blocks
+    accordions: List[Tuple[str, str]] = field(default_factory=list)  # <details>: (summary, remaining text)
+    microdata_faqs: List[Dict[str, str]] = field(default_factory=list)  # schema.org/Question items
+
+
+def clean_text(raw: str) -> str:
+    """Collapse whitespace the way the scraper always has"""
+    lines = (line.strip() for line in raw.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+
+class _PageTarget:
+    """Builds a PageExtract from start/end/data events.
+
+    Used directly as an lxml parser target (no tree is built) and fed by
+    extract_page() when walking a BeautifulSoup tree, so both backends share
+    one set of rules. Text matches BeautifulSoup's get_text(), including its
+    collapsing of whitespace-only strings.
+    """
+
+    def __init__(self, base_url: str, text_only: bool):
+        self.base_url = base_url
+        self.text_only = text_only
+        self.page = PageExtract()
+        self.texts = []
+        self.seen_socials = set()
+        # Open elements collecting their own text: [kind, value, parts]
+        self.collectors = []
+        # Per open element: (_TAG_FLAGS entry or None, collector it opened)
+        self.stack = []
+        self.hidden = 0
+        self.containers = 0
+        self.preserve = 0
+        self.pending = []
+
+    def _innermost(self, kind: str) -> Optional[list]:
+        for c in reversed(self.collectors):
+            if c[0] == kind:
+                return c
+        return None
+
+    def _flush(self) -> None:
+        if not self.pending:
+            return
+        data = "".join(self.pending)
+        self.pending = []
+        if not self.preserve and not data.strip(_ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        if self.containers:
+            # Script contents only matter for JSON-LD
+            for c in self.collectors:
+                if c[0] == "ldjson":
+                    c[2].append(data)
+            return
+        if not self.hidden:
+            self.texts.append(data)
+        for c in self.collectors:
+            c[2].append(data)
+
+    def _open_collector(self, tag: str, attrib) -> Optional[list]:
+        if tag == "script":
+            if "ld+json" in (attrib.get("type") or "").lower():
+                return ["ldjson", None, []]
+            return None
+        if tag == "details":
+            return ["details", None, []]
+        if tag == "summary" and self._innermost("details"):
+            return ["summary", None, []]
+        itemtype = attrib.get("itemtype") if attrib else None
+        if itemtype and itemtype.rstrip("/").lower().endswith("schema.org/question"):
+            return ["question", {}, []]
+        itemprop = (attrib.get("itemprop") or "").split() if attrib and self.collectors else None
+        question = self._innermost("question") if itemprop else None
+        if question is not None and ("name" in itemprop or "text" in itemprop):
+            prop = "question" if "name" in itemprop else "answer"
+            if attrib.get("content") is not None:
+                question[1].setdefault(prop, attrib.get("content"))
+                return None
+            return ["itemprop", prop, []]
+        if self.text_only:
+            return None
+        if tag == "a":
+            href = attrib.get("href")
+            if href is None:
+                return None
+            if "/products/" in href:
+                self.page.product_hrefs.append(href)
+            if href and href not in self.seen_socials:
+                platform = social_platform(href)
+                if platform:
+                    self.seen_socials.add(href)
+                    self.page.socials.append({"platform": platform, "url": href})
+            return ["a", href, []]
+        if tag == "title" and self.page.title is None and not self._innermost("title"):
+            return ["title", None, []]
+        if tag == "meta" and self.page.og_site_name is None and attrib.get("property") == "og:site_name":
+            self.page.og_site_name = attrib.get("content") or ""
+        return None
+
+    def _close_collector(self, collector: list) -> None:
+        kind, value, parts = collector
+        text = "".join(parts)
+        if kind == "a":
+            text = text.strip().lower()
+            if text and len(text) < MAX_LINK_TEXT:
+                self.page.links[text] = urljoin(self.base_url, value)
+        elif kind == "title":
+            self.page.title = text
+        elif kind == "ldjson":
+            try:
+                self.page.json_ld.append(json.loads(text))
+            except ValueError:
+                pass
+        elif kind == "summary":
+            details = self._innermost("details")
+            if details is not None and details[1] is None:
+                details[1] = text
+        elif kind == "details":
+            if value is not None:
+                question = clean_text(value)
+                answer = clean_text(text.replace(value, "", 1))
+                if question and answer:
+                    self.page.accordions.append((question, answer))
+        elif kind == "itemprop":
+            question = self._innermost("question")
+            if question is not None:
+                question[1].setdefault(value, clean_text(text))
+        elif kind == "question":
+            if value.get("question") and value.get("answer"):
+                self.page.microdata_faqs.append({"question": value["question"], "answer": value["answer"]})
+
+    def start(self, tag, attrib) -> None:
+        if self.pending:
+            self._flush()
+        collector = self._open_collector(tag, attrib)
+        if collector is not None:
+            self.collectors.append(collector)
+        flags = _TAG_FLAGS.get(tag)
+        self.stack.append((flags, collector))
+        if flags:
+            self.hidden += flags[0]
+            self.containers += flags[1]
+            self.preserve += flags[2]
+
+    def end(self, tag) -> None:
+        if self.pending:
+            self._flush()
+        if not self.stack:
+            return
+        flags, collector = self.stack.pop()
+        if flags:
+            self.hidden -= flags[0]
+            self.containers -= flags[1]
+            self.preserve -= flags[2]
+        if collector is not None:
+            self.collectors.pop()
+            self._close_collector(collector)
+
+    def data(self, data) -> None:
+        self.pending.append(data)
+
+    def comment(self, text) -> None:
+        self._flush()
+
+    def pi(self, target, data=None) -> None:
+        self._flush()
+
+    def doctype(self, *args) -> None:
+        self._flush()
+
+    def close(self) -> PageExtract:
+        self._flush()
+        self.page.text = clean_text("".join(self.texts))
+        return self.page
+
+
+def extract_page(soup: BeautifulSoup, base_url: str = "", text_only: bool = False) -> PageExtract:
+    """Walk a BeautifulSoup tree once and collect links, social URLs, product links,
+    clean text and structured data.
+
+    The tree is not modified, so the same soup can be read again afterwards.
+    Text inside HIDDEN_TAGS is skipped for page.text but still counts towards
+    link texts, matching what separate find_all()/get_text() passes returned.
+    text_only skips links, socials, product links, title and og:site_name.
+    """
+    target = _PageTarget(base_url, text_only)
+    if not soup:
+        return target.close()
+    # Each frame: (tag name, iterator over its children)
+    start, end, data = target.start, target.end, target.data
+    stack = [(None, iter(soup.contents))]
+    while stack:
+        name, children = stack[-1]
+        for child in children:
+            if isinstance(child, Tag):
+                start(child.name, child.attrs)
+                stack.append((child.name, iter(child.contents)))
+                break  # descend; this frame resumes after the child is closed
+            if type(child) in TEXT_TYPES or isinstance(child, CONTAINER_TYPES):
+                data(str(child))
+            else:
+                target.comment(None)
+        else:
+            stack.pop()
+            if name is not None:
+                end(name)
+    return target.close()
+
+
+def extract_page_lxml(html: bytes, base_url: str = "", text_only: bool = False) -> PageExtract:
+    """extract_page() straight from lxml parse events, skipping tree construction.
+
+    Encodings are tried in the order BeautifulSoup would try them.
+    """
+    if not html:
+        return PageExtract()
+    last_error = None
+    for encoding in EncodingDetector(html, is_html=True).encodings:
+        parser = etree.HTMLParser(target=_PageTarget(base_url, text_only), encoding=encoding, recover=True)
+        try:
+            parser.feed(html)
+            return parser.close()
+        except (UnicodeDecodeError, LookupError, etree.ParserError) as e:
+            last_error = e
+    raise ValueError(f"Could not parse HTML: {last_error}")
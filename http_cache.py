@@ -0,0 +1,150 @@
+# http_cache.py
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+HTTP_CACHE_MAX_ENTRY_BYTES = int(os.getenv("HTTP_CACHE_MAX_ENTRY_BYTES", str(10 * 1024 * 1024)))
+
+# Set on responses rebuilt from the cache after a 304
+CACHE_STATUS_HEADER = "x-page-cache"
+
+_KEPT_HEADERS = ("content-type", "etag", "last-modified")
+
+
+class PageCache:
+    """On-disk store of response bodies plus their ETag/Last-Modified validators.
+
+    Each URL maps to <sha256>.body and <sha256>.json in the cache directory.
+    File mtimes track recency; the least recently used entries are removed
+    once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_entry_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self._stats = {"revalidated": 0, "stored": 0, "evictions": 0}
+
+    def _paths(self, url: str):
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, digest)
+        return base + ".json", base + ".body"
+
+    def _total_size(self) -> int:
+        if self._size is None:
+            self._size = 0
+            if os.path.isdir(self.directory):
+                for entry in os.scandir(self.directory):
+                    if entry.is_file():
+                        self._size += entry.stat().st_size
+        return self._size
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Stored metadata for url, or None"""
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def validators(self, meta: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last-modified"):
+                headers["If-Modified-Since"] = meta["last-modified"]
+        return headers
+
+    def load(self, url: str, meta: Dict, request: httpx.Request) -> Optional[httpx.Response]:
+        """Rebuild a 200 response from the stored body after a 304"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(body_path, "rb") as f:
+                body = f.read()
+            now = time.time()
+            os.utime(meta_path, (now, now))
+            os.utime(body_path, (now, now))
+        except OSError:
+            return None
+        headers = {key: meta[key] for key in _KEPT_HEADERS if meta.get(key)}
+        headers[CACHE_STATUS_HEADER] = "revalidated"
+        with self._lock:
+            self._stats["revalidated"] += 1
+        return httpx.Response(200, headers=headers, content=body, request=request)
+
+    def store(self, url: str, response: httpx.Response) -> None:
+        """Save a 200 response that carries validators"""
+        if response.status_code != 200:
+            return
+        if not (response.headers.get("etag") or response.headers.get("last-modified")):
+            return
+        body = response.content
+        if len(body) > self.max_entry_bytes:
+            return
+        meta = {key: response.headers.get(key) for key in _KEPT_HEADERS}
+        meta["url"] = url
+        meta_bytes = json.dumps(meta).encode("utf-8")
+        meta_path, body_path = self._paths(url)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._lock:
+                size = self._total_size()
+                old = sum(os.path.getsize(p) for p in (meta_path, body_path) if os.path.exists(p))
+                for path, data in ((body_path, body), (meta_path, meta_bytes)):
+                    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                    with open(tmp_path, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+                self._size = size - old + len(body) + len(meta_bytes)
+                self._stats["stored"] += 1
+                if self._size > self.max_bytes:
+                    self._evict()
+        except OSError as e:
+            logger.warning(f"Page cache write failed for {url}: {e}")
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache is 90% of max_bytes"""
+        entries = {}
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            key = entry.name.rsplit(".", 1)[0]
+            stat = entry.stat()
+            mtime, size = entries.get(key, (0.0, 0))
+            entries[key] = (max(mtime, stat.st_mtime), size + stat.st_size)
+        target = int(self.max_bytes * 0.9)
+        for key, (_, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if self._size <= target:
+                break
+            for suffix in (".json", ".body"):
+                try:
+                    os.remove(os.path.join(self.directory, key + suffix))
+                except OSError:
+                    pass
+            self._size -= size
+            self._stats["evictions"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["bytes"] = self._total_size()
+        stats["enabled"] = HTTP_CACHE_ENABLED
+        return stats
+
+
+page_cache = PageCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_MAX_ENTRY_BYTES)
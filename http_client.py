@@ -0,0 +1,556 @@
+# http_client.py
+import asyncio
+import ipaddress
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpcore
+import httpx
+
+from http_cache import HTTP_CACHE_ENABLED, page_cache
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Pool and retry settings (override through environment variables)
+REQUEST_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "10"))
+RETRY_AFTER_MAX = float(os.getenv("HTTP_RETRY_AFTER_MAX", "60"))
+DNS_CACHE_TTL = float(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Per-host politeness: concurrent requests, spacing between request starts
+# (seconds), and how far 429/503 responses may stretch that spacing
+HOST_MAX_CONCURRENCY = int(os.getenv("HTTP_HOST_MAX_CONCURRENCY", "4"))
+HOST_MIN_INTERVAL = float(os.getenv("HTTP_HOST_MIN_INTERVAL", "0.1"))
+HOST_MAX_INTERVAL = float(os.getenv("HTTP_HOST_MAX_INTERVAL", "30"))
+# Statuses that mean the host wants us to slow down
+SLOWDOWN_STATUSES = {429, 503}
+# robots.txt Crawl-delay / Request-rate are honoured up to ROBOTS_MAX_CRAWL_DELAY seconds
+ROBOTS_ENABLED = os.getenv("HTTP_ROBOTS_ENABLED", "1") == "1"
+ROBOTS_CACHE_TTL = float(os.getenv("HTTP_ROBOTS_CACHE_TTL", "3600"))
+ROBOTS_MAX_CRAWL_DELAY = float(os.getenv("HTTP_ROBOTS_MAX_CRAWL_DELAY", "10"))
+
+
+class DNSCache:
+    """Thread-safe host -> addresses cache with a fixed TTL"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str, port: int) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            self._entries.pop((host, port), None)
+            return None
+
+    def put(self, host: str, port: int, addresses: List[str]) -> None:
+        with self._lock:
+            self._entries[(host, port)] = (addresses, time.monotonic() + self.ttl)
+
+    def prefer(self, host: str, port: int, address: str) -> None:
+        """Move an address that just connected to the front of the host's list"""
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry and address in entry[0] and entry[0][0] != address:
+                addresses = [address] + [a for a in entry[0] if a != address]
+                self._entries[(host, port)] = (addresses, entry[1])
+
+    def evict(self, host: str, port: int) -> None:
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+dns_cache = DNSCache(DNS_CACHE_TTL)
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def _addresses(infos: list) -> List[str]:
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not addresses:
+        raise httpcore.ConnectError("DNS lookup returned no addresses")
+    return addresses
+
+
+class CachingAsyncBackend(httpcore.AnyIOBackend):
+    """Network backend that resolves hosts through the shared DNS cache.
+
+    Every resolved address is tried in turn; the host is only evicted from
+    the cache when none of them accepts the connection.
+    """
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        if _is_ip(host):
+            return await super().connect_tcp(host, port, timeout, local_address, socket_options)
+        addresses = dns_cache.get(host, port)
+        if addresses is None:
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+                addresses = _addresses(infos)
+            except OSError as e:
+                raise httpcore.ConnectError(str(e)) from e
+            dns_cache.put(host, port, addresses)
+        for address in addresses:
+            try:
+                stream = await super().connect_tcp(address, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                error = e
+                continue
+            dns_cache.prefer(host, port, address)
+            return stream
+        dns_cache.evict(host, port)
+        raise error
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _pool_options() -> dict:
+    limits = _limits()
+    return {
+        "ssl_context": httpx.create_ssl_context(),
+        "max_connections": limits.max_connections,
+        "max_keepalive_connections": limits.max_keepalive_connections,
+        "keepalive_expiry": limits.keepalive_expiry,
+    }
+
+
+# httpcore errors raised by the pool, as the httpx errors callers catch (most specific first)
+_HTTPCORE_ERRORS = [
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+]
+
+
+@contextmanager
+def _httpx_errors(request: Optional[httpx.Request] = None):
+    try:
+        yield
+    except httpx.HTTPError:
+        raise
+    except Exception as e:
+        for core_error, httpx_error in _HTTPCORE_ERRORS:
+            if isinstance(e, core_error):
+                raise httpx_error(str(e), request=request) from e
+        raise
+
+
+def _core_request(request: httpx.Request) -> httpcore.Request:
+    return httpcore.Request(
+        method=request.method,
+        url=httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host,
+                         port=request.url.port, target=request.url.raw_path),
+        headers=request.headers.raw,
+        content=request.stream,
+        extensions=request.extensions,
+    )
+
+
+class _AsyncStream(httpx.AsyncByteStream):
+    def __init__(self, stream, request: httpx.Request):
+        self._stream = stream
+        self._request = request
+
+    async def __aiter__(self):
+        with _httpx_errors(self._request):
+            async for part in self._stream:
+                yield part
+
+    async def aclose(self) -> None:
+        if hasattr(self._stream, "aclose"):
+            await self._stream.aclose()
+
+
+class AsyncPooledTransport(httpx.AsyncBaseTransport):
+    """httpx transport over an httpcore.AsyncConnectionPool built with our own network backend"""
+
+    def __init__(self, network_backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        self._connections = httpcore.AsyncConnectionPool(network_backend=network_backend, **_pool_options())
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with _httpx_errors(request):
+            response = await self._connections.handle_async_request(_core_request(request))
+        return httpx.Response(status_code=response.status, headers=response.headers,
+                              stream=_AsyncStream(response.stream, request), extensions=response.extensions)
+
+    async def aclose(self) -> None:
+        await self._connections.aclose()
+
+
+def _async_transport() -> httpx.AsyncBaseTransport:
+    if DNS_CACHE_TTL > 0:
+        return AsyncPooledTransport(CachingAsyncBackend())
+    return httpx.AsyncHTTPTransport(limits=_limits())
+
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Pooled async client for the running event loop (connections are loop-bound)"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=REQUEST_TIMEOUT,
+            follow_redirects=True,
+            transport=_async_transport(),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="http-client-loop", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro):
+    """Run a coroutine on the shared background loop so pooled connections outlive a single call"""
+    loop = _background_loop()
+    if threading.current_thread().name == "http-client-loop":
+        coro.close()
+        raise RuntimeError("run_sync() called from the shared loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+async def run_shared(coro):
+    """Await a coroutine on the shared background loop from any other event loop"""
+    loop = _background_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    # Cancelling the awaiting task also cancels the coroutine on the shared loop
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def iter_shared(agen) -> AsyncIterator:
+    """Iterate an async generator running on the shared background loop from any other event loop"""
+    loop = _background_loop()
+    caller = asyncio.get_running_loop()
+    if caller is loop:
+        async for item in agen:
+            yield item
+        return
+    items: asyncio.Queue = asyncio.Queue()
+    end = object()
+
+    async def pump():
+        error = None
+        try:
+            async for item in agen:
+                caller.call_soon_threadsafe(items.put_nowait, (item, None))
+        except Exception as e:
+            error = e
+        finally:
+            caller.call_soon_threadsafe(items.put_nowait, (end, error))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), loop)
+    try:
+        while True:
+            item, error = await items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # Stops the generator if the consumer goes away early
+        future.cancel()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> Optional[float]:
+    """Seconds to wait before the next attempt, or None if we should give up"""
+    if attempt >= MAX_RETRIES:
+        return None
+    if response is not None:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return retry_after if retry_after <= RETRY_AFTER_MAX else None
+    # Full jitter exponential backoff
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class _HostState:
+    __slots__ = ("base_interval", "interval", "next_at", "slowdowns")
+
+    def __init__(self, interval: float):
+        self.base_interval = interval  # configured spacing or the robots.txt crawl delay
+        self.interval = interval  # current spacing, stretched after 429/503
+        self.next_at = 0.0  # monotonic time the next request may start
+        self.slowdowns = 0
+
+
+class HostScheduler:
+    """Per-host request pacing shared by every event loop.
+
+    Each request reserves the host's next start slot (spaced by its current
+    interval) and holds one of HOST_MAX_CONCURRENCY slots while it runs.
+    A 429/503 doubles the interval and pauses the host for Retry-After;
+    later successes shrink it back towards the base. Concurrency slots are
+    per event loop; pacing is process-wide.
+    """
+
+    def __init__(self, max_concurrency: int = HOST_MAX_CONCURRENCY, min_interval: float = HOST_MIN_INTERVAL,
+                 max_interval: float = HOST_MAX_INTERVAL):
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+        self._async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+    def _state(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.min_interval)
+        return state
+
+    def reserve(self, host: str) -> float:
+        """Claim the host's next start slot; return seconds to wait for it"""
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            start = max(now, state.next_at)
+            state.next_at = start + state.interval
+            return start - now
+
+    def record(self, host: str, status_code: int, retry_after: Optional[float] = None) -> None:
+        """Adapt the host's spacing to a response status"""
+        with self._lock:
+            state = self._state(host)
+            if status_code in SLOWDOWN_STATUSES:
+                state.slowdowns += 1
+                state.interval = min(self.max_interval, max(state.interval * 2, state.base_interval, 0.5))
+                pause = min(retry_after, RETRY_AFTER_MAX) if retry_after is not None else state.interval
+                state.next_at = max(state.next_at, time.monotonic() + pause)
+                logger.warning(f"{host} answered {status_code}; spacing requests {state.interval:.2f}s apart")
+            elif state.interval > state.base_interval:
+                state.interval = max(state.base_interval, state.interval * 0.8)
+
+    def set_crawl_delay(self, host: str, delay: float) -> None:
+        with self._lock:
+            state = self._state(host)
+            state.base_interval = max(self.min_interval, min(delay, ROBOTS_MAX_CRAWL_DELAY))
+            state.interval = max(state.interval, state.base_interval)
+
+    def _async_slot(self, host: str) -> asyncio.Semaphore:
+        slots = self._async_slots.setdefault(asyncio.get_running_loop(), {})
+        if host not in slots:
+            slots[host] = asyncio.Semaphore(self.max_concurrency)
+        return slots[host]
+
+    @asynccontextmanager
+    async def aslot(self, host: str):
+        async with self._async_slot(host):
+            wait = self.reserve(host)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Hosts currently paced slower than the configured minimum"""
+        with self._lock:
+            return {
+                host: {"interval": round(state.interval, 3), "base_interval": state.base_interval,
+                       "slowdowns": state.slowdowns}
+                for host, state in self._hosts.items() if state.interval > self.min_interval
+            }
+
+
+host_scheduler = HostScheduler()
+
+
+class RobotsCache:
+    """Parsed robots.txt per origin, kept for ROBOTS_CACHE_TTL"""
+
+    def __init__(self, ttl: float = ROBOTS_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[RobotFileParser, float]] = {}
+        self._lock = threading.Lock()
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+
+    def get(self, origin: str) -> Optional[RobotFileParser]:
+        with self._lock:
+            entry = self._entries.get(origin)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            return None
+
+    def _store(self, origin: str, status_code: Optional[int], text: str) -> RobotFileParser:
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        # Missing or unreadable robots.txt means no rules
+        parser.parse(text.splitlines() if status_code == 200 else [])
+        with self._lock:
+            self._entries[origin] = (parser, time.monotonic() + self.ttl)
+        agent = HEADERS["User-Agent"]
+        delay = parser.crawl_delay(agent)
+        rate = parser.request_rate(agent)
+        if rate and rate.requests:
+            delay = max(float(delay or 0), rate.seconds / rate.requests)
+        if delay:
+            host_scheduler.set_crawl_delay(urlsplit(origin).netloc, float(delay))
+        return parser
+
+    async def aload(self, origin: str) -> RobotFileParser:
+        parser = self.get(origin)
+        if parser is not None:
+            return parser
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(origin)
+        if task is None or task.done():
+            task = tasks[origin] = asyncio.ensure_future(self._afetch(origin))
+        return await asyncio.shield(task)
+
+    async def _afetch(self, origin: str) -> RobotFileParser:
+        try:
+            response = await get_async_client().get(f"{origin}/robots.txt")
+            return self._store(origin, response.status_code, response.text)
+        except httpx.HTTPError as e:
+            logger.info(f"Could not read {origin}/robots.txt: {e}")
+            return self._store(origin, None, "")
+
+robots_cache = RobotsCache()
+
+
+def _origin(url: str) -> Tuple[str, str]:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}", parts.netloc
+
+
+def _record(host: str, response: httpx.Response) -> None:
+    host_scheduler.record(host, response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+
+
+async def _afetch(url: str, **kwargs) -> httpx.Response:
+    client = get_async_client()
+    origin, host = _origin(url)
+    if ROBOTS_ENABLED and not url.endswith("/robots.txt"):
+        await robots_cache.aload(origin)
+    attempt = 0
+    while True:
+        try:
+            async with host_scheduler.aslot(host):
+                response = await client.get(url, **kwargs)
+            _record(host, response)
+        except httpx.TransportError as e:
+            delay = retry_delay(attempt)
+            if delay is None:
+                raise
+            logger.warning(f"Retrying {url} in {delay:.2f}s after error: {e}")
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            delay = retry_delay(attempt, response)
+            if delay is None:
+                return response
+            logger.warning(f"Retrying {url} in {delay:.2f}s after status {response.status_code}")
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def afetch(url: str, **kwargs) -> httpx.Response:
+    """GET with retry on transient errors and conditional revalidation, using the pooled async client"""
+    use_cache = HTTP_CACHE_ENABLED and not kwargs
+    meta = await asyncio.to_thread(page_cache.lookup, url) if use_cache else None
+    if meta:
+        kwargs["headers"] = page_cache.validators(meta)
+    response = await _afetch(url, **kwargs)
+    if use_cache:
+        if response.status_code == 304 and meta:
+            cached = await asyncio.to_thread(page_cache.load, url, meta, response.request)
+            return cached or await _afetch(url)
+        await asyncio.to_thread(page_cache.store, url, response)
+    return response
+
+
+class FetchSession:
+    """Per-scrape view over the shared client: each URL is downloaded at most once"""
+
+    def __init__(self):
+        self._responses: Dict[str, asyncio.Task] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def get(self, url: str) -> httpx.Response:
+        task = self._responses.get(url)
+        if task is None:
+            task = asyncio.ensure_future(afetch(url))
+            self._responses[url] = task
+        # Shield so one cancelled caller does not cancel the download for the others
+        return await asyncio.shield(task)
+
+    def create_task(self, coro) -> asyncio.Task:
+        """Start a task that is cancelled together with the session"""
+        task = asyncio.ensure_future(coro)
+        self._tasks.append(task)
+        return task
+
+    def cancel(self) -> None:
+        for task in [*self._responses.values(), *self._tasks]:
+            task.cancel()
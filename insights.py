@@ -0,0 +1,373 @@
+# insights.py
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from http_client import iter_shared, run_shared
+from scraper import (
+    normalize_url, scrape_with_competitors, async_scrape_with_competitors, aiter_scrape_many,
+    SCRAPE_CONCURRENCY, FINGERPRINTS_KEY, SectionCallback
+)
+from database import AsyncSessionLocal, BrandData, CompetitorData
+from competitor import get_competitors
+from persistence import save_store
+from serialization import decode_blob
+from singleflight import SingleFlight, acquire_lease, lease_held, release_lease
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages, in order, as reported to progress callbacks
+STAGES = ["scrape", "save_brand", "save_competitors"]
+
+ProgressCallback = Callable[[str, str], None]
+EventListener = Callable[[dict], None]
+
+# Cross-worker coalescing through lease rows, for deployments running several
+# API processes. In-process coalescing is always on.
+SCRAPE_LEASES_ENABLED = os.getenv("SCRAPE_LEASES_ENABLED", "0") == "1"
+SCRAPE_LEASE_TTL = float(os.getenv("SCRAPE_LEASE_TTL", "300"))
+SCRAPE_LEASE_POLL = float(os.getenv("SCRAPE_LEASE_POLL", "1"))
+
+_flights = SingleFlight()
+
+
+class _EventFanout:
+    """Section and stage events of one shared run, sent to every subscriber.
+
+    Subscribers joining late first get the events published so far. publish()
+    may be called from the shared HTTP loop's thread, so listeners must be
+    thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._history: List[dict] = []
+        self._listeners: List[EventListener] = []
+
+    def publish(self, event: dict) -> None:
+        with self._lock:
+            self._history.append(event)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(event)
+
+    def subscribe(self, listener: EventListener) -> None:
+        with self._lock:
+            for event in self._history:
+                listener(event)
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: EventListener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def progress(self, stage: str, state: str) -> None:
+        self.publish({"event": "stage", "stage": stage, "state": state})
+
+    def on_section(self, section: str, value) -> None:
+        self.publish({"event": "section", "section": section, "data": value})
+
+
+_fanouts: Dict[Hashable, _EventFanout] = {}
+
+def public_result(result: Optional[dict]) -> Optional[dict]:
+    """A stored or fresh scrape result without its internal section fingerprints"""
+    if not isinstance(result, dict):
+        return result
+    return {key: value for key, value in result.items() if key not in (FINGERPRINTS_KEY, "section_fingerprints")}
+
+def _load(data: Optional[str]) -> Optional[dict]:
+    try:
+        return decode_blob(data)
+    except ValueError:
+        return None
+
+def _load_stored(db: Session, website: str, include_competitors: bool):
+    """Stored brand result and {competitor_website: result} for a normalized website"""
+    stored = _load(db.scalar(select(BrandData.data).where(BrandData.website == website)))
+    stored_competitors = {}
+    if include_competitors:
+        rows = db.execute(
+            select(CompetitorData.competitor_website, CompetitorData.data)
+            .where(CompetitorData.brand_website == website)
+        )
+        stored_competitors = {url: _load(data) for url, data in rows}
+    return stored, stored_competitors
+
+def cached_insights(db: Session, website_url: str, include_competitors: bool) -> Optional[Tuple[dict, float]]:
+    """Stored response payload for a website and its age in seconds.
+
+    None when the store has never been scraped, or competitors were asked
+    for and none are stored.
+    """
+    website = normalize_url(website_url)
+    row = db.execute(
+        select(BrandData.data, BrandData.last_scraped_at).where(BrandData.website == website)
+    ).first()
+    if not row or row.last_scraped_at is None:
+        return None
+    brand = _load(row.data)
+    if not brand:
+        return None
+    response_data = {"brand": public_result(brand)}
+    if include_competitors:
+        _, stored_competitors = _load_stored(db, website, True)
+        competitors = [public_result(comp) for comp in stored_competitors.values() if comp]
+        if not competitors:
+            return None
+        response_data["competitors"] = competitors
+    return response_data, (datetime.utcnow() - row.last_scraped_at).total_seconds()
+
+def _save_results(db: Session, result: dict, comp_results: List[dict], stored: Optional[dict],
+                  stored_competitors: dict, include_competitors: bool, report: ProgressCallback) -> dict:
+    """Persist a successful scrape in one transaction and return the response payload"""
+    report("save_brand", "running")
+    if include_competitors:
+        report("save_competitors", "running")
+    save_store(db, result, comp_results if include_competitors else (),
+               previous=stored, competitor_previous=stored_competitors)
+    db.commit()
+    report("save_brand", "done")
+
+    response_data = {"brand": public_result(result)}
+    if include_competitors:
+        response_data["competitors"] = [public_result(comp) for comp in comp_results if "error" not in comp]
+        comp_errors = [
+            {"website": comp.get("website"), "error": comp["error"]} for comp in comp_results if "error" in comp
+        ]
+        if comp_errors:
+            response_data["competitor_errors"] = comp_errors
+        report("save_competitors", "done")
+    else:
+        report("save_competitors", "skipped")
+
+    return response_data
+
+def _previous_results(stored: Optional[dict], stored_competitors: dict, incremental: bool):
+    if not incremental:
+        return None, {}
+    return stored, stored_competitors
+
+def _reporter(progress: Optional[ProgressCallback]) -> ProgressCallback:
+    def report(stage: str, state: str):
+        if progress:
+            progress(stage, state)
+    return report
+
+def build_insights(website_url: str, include_competitors: bool, db: Session,
+                   progress: Optional[ProgressCallback] = None, incremental: bool = True) -> dict:
+    """Scrape a store (and optionally its competitors) and persist the results.
+
+    Returns the response payload, or {"error", "status_code"} when the brand
+    scrape fails. progress(stage, state) is called as each stage starts and ends.
+    In incremental mode the stored results are passed to the scraper so that
+    unchanged sections skip LLM processing, and unchanged rows are not rewritten.
+    """
+    report = _reporter(progress)
+    report("scrape", "running")
+    competitor_urls = get_competitors(website_url) if include_competitors else []
+    stored, stored_competitors = _load_stored(db, normalize_url(website_url), include_competitors)
+    previous, competitor_previous = _previous_results(stored, stored_competitors, incremental)
+
+    # Brand and competitors are scraped concurrently; slow competitors are timed out
+    result, comp_results = scrape_with_competitors(
+        website_url, competitor_urls, previous=previous, competitor_previous=competitor_previous
+    )
+    if "error" in result:
+        report("scrape", "failed")
+        return result
+    report("scrape", "done")
+
+    return _save_results(db, result, comp_results, stored, stored_competitors, include_competitors, report)
+
+async def abuild_insights(website_url: str, include_competitors: bool, db: AsyncSession,
+                          progress: Optional[ProgressCallback] = None, incremental: bool = True,
+                          on_section: Optional[SectionCallback] = None) -> dict:
+    """build_insights for async callers.
+
+    The scrape runs on the shared HTTP loop and the database work on the
+    async session, so the calling event loop is never blocked. on_section
+    is called on the shared loop's thread as brand sections become ready.
+    """
+    report = _reporter(progress)
+    report("scrape", "running")
+    competitor_urls = get_competitors(website_url) if include_competitors else []
+    stored, stored_competitors = await db.run_sync(_load_stored, normalize_url(website_url), include_competitors)
+    previous, competitor_previous = _previous_results(stored, stored_competitors, incremental)
+
+    result, comp_results = await run_shared(async_scrape_with_competitors(
+        website_url, competitor_urls, previous=previous, competitor_previous=competitor_previous,
+        on_section=on_section
+    ))
+    if "error" in result:
+        report("scrape", "failed")
+        return result
+    report("scrape", "done")
+
+    return await db.run_sync(
+        _save_results, result, comp_results, stored, stored_competitors, include_competitors, report
+    )
+
+async def ashared_insights(website_url: str, include_competitors: bool, incremental: bool = True,
+                           listener: Optional[EventListener] = None) -> dict:
+    """abuild_insights coalesced per store.
+
+    Concurrent callers asking for the same normalized website and options
+    share one scrape and its result. The shared run uses its own session,
+    so it finishes (and saves) even if the caller that started it goes away.
+    listener(event) receives the run's section and stage events, including
+    those sent before the caller joined.
+    """
+    key = (normalize_url(website_url), bool(include_competitors), bool(incremental))
+    fanout = _fanouts.get(key)
+    if fanout is None:
+        fanout = _fanouts[key] = _EventFanout()
+    if listener:
+        fanout.subscribe(listener)
+    try:
+        return await _flights.run(key, lambda: _run_shared(website_url, include_competitors, incremental, key, fanout))
+    finally:
+        if listener:
+            fanout.unsubscribe(listener)
+
+async def _run_shared(website_url: str, include_competitors: bool, incremental: bool,
+                      key: Hashable, fanout: _EventFanout) -> dict:
+    try:
+        async with AsyncSessionLocal() as db:
+            if not SCRAPE_LEASES_ENABLED:
+                return await abuild_insights(website_url, include_competitors, db, progress=fanout.progress,
+                                             incremental=incremental, on_section=fanout.on_section)
+            return await _run_leased(website_url, include_competitors, incremental, db, fanout)
+    finally:
+        if _fanouts.get(key) is fanout:
+            del _fanouts[key]
+
+async def _run_leased(website_url: str, include_competitors: bool, incremental: bool, db: AsyncSession,
+                      fanout: _EventFanout) -> dict:
+    """Scrape under the store's lease, or wait for the worker holding it and use what it saved"""
+    key = f"{normalize_url(website_url)}|{int(include_competitors)}|{int(incremental)}"
+    owner = uuid.uuid4().hex
+    started = datetime.utcnow()
+    while True:
+        if await db.run_sync(acquire_lease, key, owner, SCRAPE_LEASE_TTL):
+            try:
+                return await abuild_insights(website_url, include_competitors, db, progress=fanout.progress,
+                                             incremental=incremental, on_section=fanout.on_section)
+            finally:
+                await db.run_sync(release_lease, key, owner)
+        await asyncio.sleep(SCRAPE_LEASE_POLL)
+        if await db.run_sync(lease_held, key):
+            continue
+        # Lease released: use the result if it was saved after we started
+        # waiting, otherwise (the other scrape failed) try to take the lease
+        cached = await db.run_sync(cached_insights, website_url, include_competitors)
+        if cached and cached[1] <= (datetime.utcnow() - started).total_seconds():
+            return cached[0]
+
+def _load_batch(db: Session, websites: List[str]) -> Dict[str, Tuple[Optional[dict], Optional[datetime]]]:
+    """{website: (stored result, last_scraped_at)} for the stored ones among websites"""
+    rows = db.execute(
+        select(BrandData.website, BrandData.data, BrandData.last_scraped_at).where(BrandData.website.in_(websites))
+    )
+    return {website: (_load(data), scraped_at) for website, data, scraped_at in rows}
+
+def _save_batch_result(db: Session, result: dict, stored: Optional[dict]) -> None:
+    save_store(db, result, previous=stored)
+    db.commit()
+
+def batch_summary(result: dict) -> dict:
+    """One NDJSON line of a batch response"""
+    if "error" in result:
+        return {"website": result.get("website"), "status": "failed", "error": result["error"],
+                "status_code": result.get("status_code", 500)}
+    return {"website": result["website"], "status": "done", "brand_name": result.get("brand_name"),
+            "product_count": len(result.get("products") or [])}
+
+async def aiter_batch_insights(website_urls: List[str], concurrency: int = SCRAPE_CONCURRENCY,
+                               incremental: bool = True, skip_fresher_than: Optional[float] = None,
+                               include_data: bool = False) -> AsyncIterator[dict]:
+    """Scrape and save many stores, yielding one line per store as it finishes.
+
+    Stores scraped less than skip_fresher_than seconds ago are reported as
+    skipped, so re-sending an interrupted batch resumes it. Each result is
+    saved as soon as it arrives.
+    """
+    websites = list(dict.fromkeys(normalize_url(url) for url in website_urls))
+    stored = {}
+    async with AsyncSessionLocal() as db:
+        for start in range(0, len(websites), 500):
+            stored.update(await db.run_sync(_load_batch, websites[start:start + 500]))
+    now = datetime.utcnow()
+    todo = []
+    for website in websites:
+        scraped_at = stored.get(website, (None, None))[1]
+        if skip_fresher_than is not None and scraped_at and (now - scraped_at).total_seconds() <= skip_fresher_than:
+            yield {"website": website, "status": "skipped"}
+        else:
+            todo.append(website)
+
+    previous = {website: stored[website][0] for website in todo if website in stored} if incremental else None
+    async for result in iter_shared(aiter_scrape_many(todo, concurrency, previous=previous)):
+        if "error" not in result:
+            # One short session per write, so no connection or transaction stays open between stores
+            async with AsyncSessionLocal() as db:
+                try:
+                    await db.run_sync(_save_batch_result, result, stored.get(result["website"], (None, None))[0])
+                except Exception as e:
+                    await db.rollback()
+                    result = {"error": f"Could not save result: {e}", "status_code": 500, "website": result["website"]}
+        line = batch_summary(result)
+        if include_data and "error" not in result:
+            line["data"] = public_result(result)
+        yield line
+
+async def aiter_insights_events(website_url: str, include_competitors: bool,
+                                incremental: bool = True) -> AsyncIterator[dict]:
+    """ashared_insights as a stream of events.
+
+    Yields {"event": "section", "section", "data"} as each brand section is
+    ready, {"event": "stage", "stage", "state"} as pipeline stages move,
+    then one {"event": "result", "data"} with the saved response payload or
+    {"event": "error", "error", "status_code"}. Streams for the same store
+    share one scrape; if the consumer stops early it stops listening and the
+    shared scrape still finishes and saves.
+    """
+    caller = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def listener(event: dict) -> None:
+        caller.call_soon_threadsafe(events.put_nowait, event)
+
+    task = asyncio.ensure_future(ashared_insights(website_url, include_competitors, incremental, listener=listener))
+    try:
+        while not task.done():
+            getter = asyncio.ensure_future(events.get())
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+        # Let callbacks scheduled before the task finished land in the queue
+        await asyncio.sleep(0)
+        while not events.empty():
+            yield events.get_nowait()
+        try:
+            response_data = task.result()
+        except Exception:
+            logger.exception(f"Unexpected error streaming insights for {website_url}")
+            yield {"event": "error", "error": "Internal server error", "status_code": 500}
+            return
+        if "error" in response_data:
+            yield {"event": "error", "error": response_data["error"],
+                   "status_code": response_data.get("status_code", 500)}
+        else:
+            yield {"event": "result", "data": response_data}
+    finally:
+        task.cancel()
@@ -0,0 +1,216 @@
+# jobs.py
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from database import SessionLocal, ScrapeJob
+from insights import STAGES, build_insights
+from scraper import normalize_url
+from serialization import decode_blob, encode_blob
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# Running jobs touch their row every JOB_HEARTBEAT_INTERVAL seconds; one not
+# touched for JOB_STALE_AFTER is assumed orphaned by a crashed or restarted worker.
+# Workers look for orphans every JOB_HEARTBEAT_INTERVAL too.
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "120"))
+
+def submit_job(db: Session, website_url: str, include_competitors: bool = False) -> ScrapeJob:
+    """Queue an insights job and return its row"""
+    job = ScrapeJob(
+        id=uuid.uuid4().hex,
+        website=normalize_url(website_url),  # as submit_refresh() looks jobs up
+        include_competitors=bool(include_competitors),
+        status="queued",
+        progress=json.dumps({stage: "pending" for stage in STAGES}),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    worker_pool.notify()
+    return job
+
+def submit_refresh(db: Session, website_url: str, include_competitors: bool = False) -> ScrapeJob:
+    """Queue a background re-scrape unless one is already queued or running for the store"""
+    job = (
+        db.query(ScrapeJob)
+        .filter(
+            ScrapeJob.website == normalize_url(website_url),
+            ScrapeJob.include_competitors == bool(include_competitors),
+            ScrapeJob.status.in_(("queued", "running")),
+        )
+        .first()
+    )
+    return job or submit_job(db, website_url, include_competitors)
+
+def job_to_dict(job: ScrapeJob) -> dict:
+    return {
+        "job_id": job.id,
+        "website": job.website,
+        "include_competitors": job.include_competitors,
+        "status": job.status,
+        "progress": json.loads(job.progress) if job.progress else {},
+        "result": decode_blob(job.result),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+def requeue_stale_jobs(db: Session) -> int:
+    """Put jobs orphaned by a crashed or restarted worker back on the queue"""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+    count = db.execute(
+        update(ScrapeJob)
+        .where(ScrapeJob.status == "running", ScrapeJob.updated_at < cutoff)
+        .values(status="queued", updated_at=datetime.utcnow())
+    ).rowcount
+    db.commit()
+    if count:
+        logger.warning(f"Requeued {count} stale jobs")
+    return count
+
+def touch_job(db: Session, job_id: str) -> bool:
+    """Heartbeat: mark a running job as still alive; False once it is no longer running"""
+    touched = db.execute(
+        update(ScrapeJob)
+        .where(ScrapeJob.id == job_id, ScrapeJob.status == "running")
+        .values(updated_at=datetime.utcnow())
+    ).rowcount
+    db.commit()
+    return bool(touched)
+
+def _heartbeat(job_id: str, done: threading.Event) -> None:
+    while not done.wait(JOB_HEARTBEAT_INTERVAL):
+        db = SessionLocal()
+        try:
+            if not touch_job(db, job_id):
+                return
+        except Exception as e:
+            logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+        finally:
+            db.close()
+
+def claim_next_job(db: Session) -> Optional[str]:
+    """Atomically move the oldest queued job to running; safe across processes"""
+    candidates = (
+        db.query(ScrapeJob.id)
+        .filter(ScrapeJob.status == "queued")
+        .order_by(ScrapeJob.created_at)
+        .limit(5)
+        .all()
+    )
+    for (job_id,) in candidates:
+        claimed = db.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.id == job_id, ScrapeJob.status == "queued")
+            .values(status="running", updated_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        if claimed:
+            return job_id
+    return None
+
+def run_job(job_id: str) -> None:
+    """Execute one claimed job, recording stage progress as it goes"""
+    db = SessionLocal()
+    done = threading.Event()
+    # The scrape can outlast JOB_STALE_AFTER between progress updates, so keep the row fresh
+    threading.Thread(target=_heartbeat, args=(job_id, done), name=f"job-heartbeat-{job_id[:8]}", daemon=True).start()
+    try:
+        job = db.get(ScrapeJob, job_id)
+        progress = json.loads(job.progress) if job.progress else {}
+
+        def on_progress(stage: str, state: str):
+            progress[stage] = state
+            job.progress = json.dumps(progress)
+            db.commit()
+
+        try:
+            result = build_insights(job.website, job.include_competitors, db, progress=on_progress)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Job {job_id} failed: {e}")
+            job.status = "failed"
+            job.error = "Internal server error"
+        else:
+            if "error" in result:
+                job.status = "failed"
+                job.error = result["error"]
+            else:
+                job.status = "done"
+                job.result = encode_blob(result)
+        db.commit()
+    finally:
+        done.set()
+        db.close()
+
+class JobWorkerPool:
+    """Background threads that poll the scrape_jobs table"""
+
+    def __init__(self, size: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.size = size
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._requeue_lock = threading.Lock()
+        self._next_requeue = 0.0
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        self._next_requeue = 0.0  # the first worker looks for orphans right away
+        for i in range(self.size):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self) -> None:
+        """Wake idle workers after a submit instead of waiting for the next poll"""
+        self._wake.set()
+
+    def _requeue_due(self) -> bool:
+        """True for the one worker whose turn it is to look for orphaned jobs"""
+        with self._requeue_lock:
+            now = time.monotonic()
+            if now < self._next_requeue:
+                return False
+            self._next_requeue = now + JOB_HEARTBEAT_INTERVAL
+            return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                db = SessionLocal()
+                try:
+                    if self._requeue_due():
+                        requeue_stale_jobs(db)
+                    job_id = claim_next_job(db)
+                finally:
+                    db.close()
+                if job_id:
+                    run_job(job_id)
+                    continue
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+worker_pool = JobWorkerPool()
@@ -0,0 +1,135 @@
+# llm_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+def make_key(function: str, model: str, prompt_version: str, text: str) -> str:
+    """Content hash identifying one LLM call"""
+    h = hashlib.sha256()
+    for part in (function, model, prompt_version, text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class LLMCache:
+    """Persistent LRU cache for LLM results, stored in a local SQLite file.
+
+    Calls block on SQLite; async callers run them with asyncio.to_thread.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._entries = 0  # counted once on connect, then tracked on every write
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed ON llm_cache (accessed_at)")
+            self._conn.commit()
+            self._entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return self._conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self._stats["misses"] += 1
+                    return default
+                value, created_at = row
+                if now - created_at > self.ttl:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    conn.commit()
+                    self._entries -= 1
+                    self._stats["expired"] += 1
+                    self._stats["misses"] += 1
+                    return default
+                conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self._stats["hits"] += 1
+            return json.loads(value)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            return default
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                exists = conn.execute("SELECT 1 FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                self._stats["writes"] += 1
+                entries = self._entries + (0 if exists else 1)
+                evicted = 0
+                if entries > self.max_entries:
+                    # Evict least recently used entries
+                    evicted = conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN ("
+                        "SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                        (entries - self.max_entries,),
+                    ).rowcount
+                conn.commit()
+                self._entries = entries - evicted
+                self._stats["evictions"] += evicted
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+            self._entries = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            try:
+                self._connection()
+                stats["entries"] = self._entries
+            except sqlite3.Error:
+                stats["entries"] = None
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["enabled"] = LLM_CACHE_ENABLED
+        return stats
+
+llm_cache = LLMCache(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL)
+
+def cache_get(key: str) -> Any:
+    """Return the cached value, or None on a miss"""
+    if not LLM_CACHE_ENABLED:
+        return None
+    return llm_cache.get(key)
+
+def cache_set(key: str, value: Any) -> None:
+    if LLM_CACHE_ENABLED:
+        llm_cache.set(key, value)
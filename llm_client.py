@@ -0,0 +1,147 @@
+# llm_client.py
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+
+from groq import AsyncGroq, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from http_client import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+# Provider limits and local dispatch settings (override through environment variables)
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "30000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# Completion tokens charged against the TPM budget up front (max_tokens is rarely used in full)
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "1000"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers reserve capacity and wait their turn"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        # _updated may lie in the future while the bucket is paused
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take amount from the bucket (going into debt if needed); return seconds to wait"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, self._updated - now) + max(0.0, -self._tokens / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every later caller for at least this long, e.g. after a 429"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._updated = max(self._updated, now + seconds)
+
+    async def acquire(self, amount: float = 1) -> None:
+        wait = self.reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {"available": round(self._tokens, 2), "capacity": self.capacity}
+
+
+request_bucket = TokenBucket(LLM_REQUESTS_PER_MINUTE)
+token_bucket = TokenBucket(LLM_TOKENS_PER_MINUTE)
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncGroq]" = weakref.WeakKeyDictionary()
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _client() -> AsyncGroq:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        if not GROQ_API_KEY:
+            raise RuntimeError("GROQ_API_KEY is not set; export it to enable LLM processing")
+        # Retries are handled here so they respect the shared rate limits
+        client = AsyncGroq(api_key=GROQ_API_KEY, max_retries=0)
+        _clients[loop] = client
+    return client
+
+
+def _semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, LLM_MAX_CONCURRENCY))
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+
+async def chat(prompt: str, model: str, temperature: float, max_tokens: int, **kwargs) -> str:
+    """Send one chat completion, waiting for rate-limit budget instead of failing"""
+    estimated = estimate_tokens(prompt) + min(max_tokens, LLM_EXPECTED_COMPLETION_TOKENS)
+    async with _semaphore():
+        attempt = 0
+        while True:
+            await request_bucket.acquire(1)
+            await token_bucket.acquire(estimated)
+            try:
+                chat_completion = await _client().chat.completions.create(
+                    messages=[{"role": "user", "content": prompt}],
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs
+                )
+                return chat_completion.choices[0].message.content or ""
+            except RateLimitError as e:
+                if attempt >= LLM_MAX_RETRIES:
+                    raise
+                delay = parse_retry_after(e.response.headers.get("retry-after")) or _backoff(attempt)
+                # Hold back every caller, not just this one, until the provider window resets
+                request_bucket.pause(delay)
+                token_bucket.pause(delay)
+                logger.warning(f"LLM rate limited, retrying in {delay:.2f}s")
+            except (APIConnectionError, APITimeoutError, InternalServerError) as e:
+                if attempt >= LLM_MAX_RETRIES:
+                    raise
+                delay = _backoff(attempt)
+                logger.warning(f"LLM request failed ({e}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    return {"requests": request_bucket.stats(), "tokens": token_bucket.stats()}
@@ -1,12 +1,47 @@
 # llm_processor.py
 from asyncio.log import logger
 from typing import Dict, List
-from groq import Groq
+import asyncio
 import os
 import json
 import re
+from http_client import run_sync
+from llm_cache import make_key, cache_get, cache_set
+from llm_client import chat
 
-client = Groq(api_key="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")
+MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+# Bump a version whenever its prompt changes so stale cache entries are not reused
+PROMPT_VERSIONS = {
+    "clean_policy_text": "1",
+    "extract_faqs": "1",
+    "summarize_about_text": "1",
+    "process_store_sections": "1",
+}
+
+# Send all sections of a store in one structured request instead of one call per section
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "0") == "1"
+
+# Placeholders returned instead of a processed section when the text was too
+# short or the LLM call failed; never worth keeping as a result to reuse
+FALLBACK_TEXTS = frozenset([
+    "Not available.",
+    "Policy content could not be properly extracted.",
+    "Error processing policy text.",
+    "Brand information could not be properly summarized.",
+    "Error processing brand information.",
+])
+
+def is_fallback(value) -> bool:
+    """True for an empty or placeholder section result (see FALLBACK_TEXTS)"""
+    if isinstance(value, dict):  # policies are stored as {"url": ..., "content": ...}
+        value = value.get("content")
+    if isinstance(value, str):
+        return value.strip() in FALLBACK_TEXTS
+    return not value
+
+def _cache_key(function: str, cleaned_text: str) -> str:
+    return make_key(function, MODEL, PROMPT_VERSIONS[function], cleaned_text)
 
 def preprocess_text(text: str) -> str:
     """Clean and preprocess text before sending to LLM"""
@@ -35,12 +70,16 @@ def preprocess_text(text: str) -> str:
     # Limit text length
     return text[:8000].strip()
 
-def clean_policy_text(dirty_text: str) -> str:
+async def aclean_policy_text(dirty_text: str) -> str:
     """Extract and clean policy text using LLM"""
     if not dirty_text or len(dirty_text.strip()) < 50:
         return "Not available."
     
     cleaned_text = preprocess_text(dirty_text)
+    cache_key = _cache_key("clean_policy_text", cleaned_text)
+    cached = await asyncio.to_thread(cache_get, cache_key)
+    if cached is not None:
+        return cached
     
     prompt = f"""
 You are a legal document processor. Extract and clean the main content from this privacy/return policy.
@@ -60,32 +99,30 @@ Raw text:
 Cleaned policy:"""
 
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            temperature=0.2,
-            max_tokens=4500
-        )
-        
-        content = chat_completion.choices[0].message.content.strip()
+        content = (await chat(prompt, model=MODEL, temperature=0.2, max_tokens=4500)).strip()
         
         if len(content) < 50:
             logger.warning("LLM returned very short policy content")
             return "Policy content could not be properly extracted."
         
+        await asyncio.to_thread(cache_set, cache_key, content)
         return content
         
     except Exception as e:
         logger.error(f"Error cleaning policy text: {str(e)}")
         return "Error processing policy text."
 
-def extract_faqs(dirty_text: str) -> List[Dict[str, str]]:
+async def aextract_faqs(dirty_text: str) -> List[Dict[str, str]]:
     """Extract FAQ pairs using LLM with better validation"""
     if not dirty_text or len(dirty_text.strip()) < 100:
         logger.info("Text too short for FAQ extraction")
         return []
     
     cleaned_text = preprocess_text(dirty_text)
+    cache_key = _cache_key("extract_faqs", cleaned_text)
+    cached = await asyncio.to_thread(cache_get, cache_key)
+    if cached is not None:
+        return cached
     
     prompt = f"""
 Extract FAQ question-answer pairs from this webpage content.
@@ -108,14 +145,7 @@ Webpage content:
 JSON Response:"""
 
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            temperature=0.1,
-            max_tokens=4500
-        )
-        
-        content = chat_completion.choices[0].message.content.strip()
+        content = (await chat(prompt, model=MODEL, temperature=0.1, max_tokens=4500)).strip()
         logger.info(f"LLM FAQ Response length: {len(content)}")
         
         # More robust JSON extraction
@@ -144,21 +174,10 @@ JSON Response:"""
                 logger.error("LLM returned non-list JSON")
                 return extract_faqs_fallback(dirty_text)
             
-            validated_faqs = []
-            for faq in faqs:
-                if (isinstance(faq, dict) and 
-                    "question" in faq and 
-                    "answer" in faq and
-                    len(str(faq["question"]).strip()) > 10 and
-                    len(str(faq["answer"]).strip()) > 10):
-                    
-                    validated_faqs.append({
-                        "question": str(faq["question"]).strip(),
-                        "answer": str(faq["answer"]).strip()
-                    })
-            
+            validated_faqs = validate_faq_list(faqs)
             logger.info(f"Successfully extracted {len(validated_faqs)} FAQs")
-            return validated_faqs[:8]  # Limit to 8 FAQs
+            await asyncio.to_thread(cache_set, cache_key, validated_faqs)
+            return validated_faqs
             
         except json.JSONDecodeError as je:
             logger.error(f"JSON parsing failed: {je}")
@@ -169,6 +188,22 @@ JSON Response:"""
         logger.error(f"LLM FAQ extraction error: {e}")
         return extract_faqs_fallback(dirty_text)
 
+def validate_faq_list(faqs: list) -> List[Dict[str, str]]:
+    """Keep well-formed question/answer pairs, at most 8"""
+    validated_faqs = []
+    for faq in faqs:
+        if (isinstance(faq, dict) and 
+            "question" in faq and 
+            "answer" in faq and
+            len(str(faq["question"]).strip()) > 10 and
+            len(str(faq["answer"]).strip()) > 10):
+            
+            validated_faqs.append({
+                "question": str(faq["question"]).strip(),
+                "answer": str(faq["answer"]).strip()
+            })
+    return validated_faqs[:8]  # Limit to 8 FAQs
+
 def extract_faqs_fallback(dirty_text: str) -> List[Dict[str, str]]:
     """Fallback FAQ extraction using pattern matching"""
     logger.info("Using fallback FAQ extraction")
@@ -225,12 +260,16 @@ def extract_faqs_fallback(dirty_text: str) -> List[Dict[str, str]]:
     
     return faqs[:6]  # Limit to 6 FAQs
 
-def summarize_about_text(dirty_text: str) -> str:
+async def asummarize_about_text(dirty_text: str) -> str:
     """Summarize about/brand text using LLM"""
     if not dirty_text or len(dirty_text.strip()) < 100:
         return "Not available."
     
     cleaned_text = preprocess_text(dirty_text)
+    cache_key = _cache_key("summarize_about_text", cleaned_text)
+    cached = await asyncio.to_thread(cache_get, cache_key)
+    if cached is not None:
+        return cached
     
     prompt = f"""
 Create a professional brand summary from this about page content.
@@ -251,25 +290,120 @@ About page content:
 Brand Summary:"""
 
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            temperature=0.4,
-            max_tokens=4500
-        )
-        
-        content = chat_completion.choices[0].message.content.strip()
+        content = (await chat(prompt, model=MODEL, temperature=0.4, max_tokens=4500)).strip()
         
         if len(content) < 50:
             logger.warning("LLM returned very short brand summary")
             return "Brand information could not be properly summarized."
         
+        await asyncio.to_thread(cache_set, cache_key, content)
         return content
         
     except Exception as e:
         logger.error(f"Error summarizing about text: {str(e)}")
         return "Error processing brand information."
 
+# Per-section instructions for the batched request, and the single-call fallback for each
+BATCH_SECTIONS = {
+    "privacy_policy": "Cleaned privacy policy: remove navigation, headers and footers, keep the actual policy, 300-500 words, clear sections.",
+    "return_refund_policy": "Cleaned return/refund policy: remove navigation, headers and footers, keep the actual policy, 300-500 words, clear sections.",
+    "faqs": "Array of up to 8 customer-focused FAQ objects {\"question\": ..., \"answer\": ...}; [] if there are none.",
+    "about_brand": "Professional brand summary in 3-5 sentences: story and mission, what makes them unique, key values, target audience.",
+}
+
+async def aprocess_store_sections(sections: Dict[str, str]) -> Dict[str, object]:
+    """Process all text sections of a store with one structured LLM call.
+
+    sections maps BATCH_SECTIONS keys to raw page text. Returns the processed
+    value per key; any section missing or malformed in the response is retried
+    with its single-purpose function.
+    """
+    single = {
+        "privacy_policy": aclean_policy_text,
+        "return_refund_policy": aclean_policy_text,
+        "faqs": aextract_faqs,
+        "about_brand": asummarize_about_text,
+    }
+    cleaned = {key: preprocess_text(text) for key, text in sections.items() if text and key in BATCH_SECTIONS}
+    results = {}
+    if not cleaned:
+        return results
+
+    cache_key = _cache_key("process_store_sections", json.dumps(cleaned, sort_keys=True))
+    parsed = await asyncio.to_thread(cache_get, cache_key)
+    if parsed is None:
+        fields = "\n".join(f'- "{key}": {BATCH_SECTIONS[key]}' for key in cleaned)
+        documents = "\n\n".join(f'### {key}\n"""\n{text}\n"""' for key, text in cleaned.items())
+        prompt = f"""
+You process scraped pages of an online store. Each document below is raw page text.
+Return ONLY a JSON object with exactly these keys:
+{fields}
+
+Documents:
+{documents}
+
+JSON Response:"""
+        try:
+            content = await chat(prompt, model=MODEL, temperature=0.2, max_tokens=6000,
+                                 response_format={"type": "json_object"})
+            parsed = json.loads(content)
+            if not isinstance(parsed, dict):
+                raise ValueError("response is not a JSON object")
+        except Exception as e:
+            logger.error(f"Batched LLM call failed, falling back per section: {e}")
+            parsed = {}
+
+    complete = True
+    for key in cleaned:
+        value = parsed.get(key)
+        if key == "faqs":
+            value = validate_faq_list(value) if isinstance(value, list) else None
+        elif not isinstance(value, str) or len(value.strip()) < 50:
+            value = None
+        else:
+            value = value.strip()
+
+        if value is None:
+            logger.warning(f"Batched response missing or malformed for {key}, falling back")
+            complete = False
+            value = await single[key](sections[key])
+        results[key] = value
+
+    if complete:
+        await asyncio.to_thread(cache_set, cache_key, {key: results[key] for key in cleaned})
+    return results
+
+# Blocking wrappers for sync callers; inside a coroutine await the a* variants instead
+def clean_policy_text(dirty_text: str) -> str:
+    return run_sync(aclean_policy_text(dirty_text))
+
+def extract_faqs(dirty_text: str) -> List[Dict[str, str]]:
+    return run_sync(aextract_faqs(dirty_text))
+
+def summarize_about_text(dirty_text: str) -> str:
+    return run_sync(asummarize_about_text(dirty_text))
+
+def process_store_sections(sections: Dict[str, str]) -> Dict[str, object]:
+    return run_sync(aprocess_store_sections(sections))
+
+# Normalisation rules of validate_and_enhance_data, also applied to sections
+# streamed before the final result so both agree
+def final_hero_products(products: List[Dict], hero_products: List[Dict]) -> List[Dict]:
+    """Hero products as reported: the first products of the catalog when there are any"""
+    if products:
+        return products[:6]  # Ensure we have hero products
+    return hero_products
+
+def dedupe_faqs(faqs: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Remove duplicate FAQs by case-insensitive question"""
+    seen_questions = set()
+    unique_faqs = []
+    for faq in faqs:
+        if faq['question'].lower() not in seen_questions:
+            seen_questions.add(faq['question'].lower())
+            unique_faqs.append(faq)
+    return unique_faqs
+
 def validate_and_enhance_data(scraped_data: dict) -> dict:
     """Final validation and enhancement of scraped data"""
     
@@ -293,18 +427,8 @@ def validate_and_enhance_data(scraped_data: dict) -> dict:
             scraped_data[field] = default_value
     
     # Validate and clean data
-    if scraped_data['products']:
-        scraped_data['hero_products'] = scraped_data['products'][:6]  # Ensure we have hero products
-    
-    # Remove duplicate FAQs
-    if scraped_data['faqs']:
-        seen_questions = set()
-        unique_faqs = []
-        for faq in scraped_data['faqs']:
-            if faq['question'].lower() not in seen_questions:
-                seen_questions.add(faq['question'].lower())
-                unique_faqs.append(faq)
-        scraped_data['faqs'] = unique_faqs
+    scraped_data['hero_products'] = final_hero_products(scraped_data['products'], scraped_data['hero_products'])
+    scraped_data['faqs'] = dedupe_faqs(scraped_data['faqs'])
     
     # Ensure social handles have proper structure
     validated_socials = []
@@ -0,0 +1,84 @@
+# migrate.py
+"""Backfill the normalized brand tables from existing brand_data JSON blobs,
+add the competitor_data unique index used by the competitor upsert, and add
+the brand_data.last_scraped_at column used by the max_age result cache.
+
+Usage: python migrate.py [--batch-size N]
+"""
+import argparse
+from sqlalchemy import delete, func, inspect, select, text
+from database import SessionLocal, BrandData, CompetitorData, engine
+from persistence import save_brand_sections
+from serialization import decode_blob
+
+def migrate_brand_blobs(batch_size: int = 200) -> int:
+    """Walk brand_data in id order and write every blob into the normalized tables"""
+    migrated = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            brands = (
+                db.query(BrandData)
+                .filter(BrandData.id > last_id)
+                .order_by(BrandData.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not brands:
+                break
+            for brand in brands:
+                last_id = brand.id
+                try:
+                    data = decode_blob(brand.data)
+                except ValueError:
+                    print(f"⚠️ Skipping {brand.website}: invalid JSON")
+                    continue
+                if data:
+                    save_brand_sections(db, brand.id, data)
+                    migrated += 1
+            db.commit()
+            db.expunge_all()
+            print(f"Migrated {migrated} brands (last id {last_id})")
+    finally:
+        db.close()
+    return migrated
+
+def add_competitor_unique_index() -> int:
+    """Drop duplicate competitor rows (keeping the newest) and create the unique index"""
+    db = SessionLocal()
+    try:
+        keep = select(func.max(CompetitorData.id).label("id")).group_by(
+            CompetitorData.brand_website, CompetitorData.competitor_website
+        )
+        if engine.dialect.name == "mysql":
+            # MySQL cannot select from the table being deleted from, hence the derived table
+            keep = select(keep.subquery().c.id)
+        removed = db.execute(delete(CompetitorData).where(CompetitorData.id.notin_(keep))).rowcount
+        db.commit()
+    finally:
+        db.close()
+    for index in CompetitorData.__table__.indexes:
+        if index.unique:
+            index.create(bind=engine, checkfirst=True)
+    print(f"Removed {removed} duplicate competitor rows")
+    return removed
+
+def add_last_scraped_column() -> bool:
+    """Add brand_data.last_scraped_at if missing; existing rows stay NULL until re-scraped"""
+    if "last_scraped_at" in {column["name"] for column in inspect(engine).get_columns("brand_data")}:
+        return False
+    column_type = BrandData.__table__.c.last_scraped_at.type.compile(dialect=engine.dialect)
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE brand_data ADD COLUMN last_scraped_at {column_type}"))
+    print("Added brand_data.last_scraped_at")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    add_last_scraped_column()
+    add_competitor_unique_index()
+    total = migrate_brand_blobs(args.batch_size)
+    print(f"✅ Done: {total} brands migrated")
@@ -7,6 +7,8 @@ class Product(BaseModel):
     handle: str
     price: str
     image: Optional[str] = None
+    id: Optional[int] = None
+    updated_at: Optional[str] = None
 
 class Policy(BaseModel):
     url: str
@@ -0,0 +1,217 @@
+# persistence.py
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Sequence
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from serialization import encode_blob
+from database import BrandData, CompetitorData, BrandProduct, BrandPolicy, BrandFAQ, BrandSocialHandle, BrandContact
+
+UPSERT_CHUNK_SIZE = 1000
+
+POLICY_KINDS = ("privacy_policy", "return_refund_policy")
+
+def _chunks(rows: List[dict], size: int) -> Iterable[List[dict]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def upsert_rows(db: Session, model, rows: List[dict], conflict_columns: Sequence[str],
+                update_columns: Sequence[str] = ()) -> None:
+    """Bulk insert rows, updating update_columns when conflict_columns already exist.
+
+    Uses the dialect's native upsert (MySQL ON DUPLICATE KEY UPDATE, PostgreSQL
+    and SQLite ON CONFLICT); conflict_columns must match a unique constraint.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        # MySQL needs at least one assignment; re-assigning a key column is a no-op
+        columns = list(update_columns) or [conflict_columns[0]]
+        stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in columns})
+    elif dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(conflict_columns),
+                set_={column: stmt.excluded[column] for column in update_columns},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(conflict_columns))
+    else:
+        raise NotImplementedError(f"Upsert is not supported for dialect {dialect}")
+    for chunk in _chunks(rows, UPSERT_CHUNK_SIZE):
+        db.execute(stmt, chunk)
+
+def parse_price(value) -> Optional[Decimal]:
+    """Numeric price from a scraped price string, or None"""
+    if value is None:
+        return None
+    match = re.search(r"\d+(?:\.\d+)?", str(value).replace(",", ""))
+    if not match:
+        return None
+    try:
+        return Decimal(match.group(0)).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None
+
+def _replace_products(db: Session, brand_id: int, result: dict) -> None:
+    rows = {}
+    for p in result.get("products") or []:
+        handle = p.get("handle")
+        if handle and handle not in rows:
+            rows[handle] = {
+                "brand_id": brand_id,
+                "shopify_id": p.get("id"),
+                "handle": handle[:255],
+                "title": (p.get("title") or "")[:512],
+                "price": parse_price(p.get("price")),
+                "price_text": str(p.get("price"))[:64] if p.get("price") is not None else None,
+                "image": p.get("image"),
+                "updated_at": p.get("updated_at"),
+            }
+    upsert_rows(db, BrandProduct, list(rows.values()), ["brand_id", "handle"],
+                ["shopify_id", "title", "price", "price_text", "image", "updated_at"])
+    db.execute(delete(BrandProduct).where(
+        BrandProduct.brand_id == brand_id, BrandProduct.handle.notin_(list(rows))
+    ))
+
+def _replace_policies(db: Session, brand_id: int, result: dict) -> None:
+    rows = [
+        {"brand_id": brand_id, "kind": kind, "url": result[kind].get("url"), "content": result[kind].get("content")}
+        for kind in POLICY_KINDS if result.get(kind)
+    ]
+    upsert_rows(db, BrandPolicy, rows, ["brand_id", "kind"], ["url", "content"])
+    db.execute(delete(BrandPolicy).where(
+        BrandPolicy.brand_id == brand_id, BrandPolicy.kind.notin_([row["kind"] for row in rows])
+    ))
+
+def _replace_faqs(db: Session, brand_id: int, result: dict) -> None:
+    rows = [
+        {"brand_id": brand_id, "position": position, "question": faq.get("question"), "answer": faq.get("answer")}
+        for position, faq in enumerate(result.get("faqs") or [])
+    ]
+    upsert_rows(db, BrandFAQ, rows, ["brand_id", "position"], ["question", "answer"])
+    db.execute(delete(BrandFAQ).where(BrandFAQ.brand_id == brand_id, BrandFAQ.position >= len(rows)))
+
+def _replace_socials(db: Session, brand_id: int, result: dict) -> None:
+    rows = {}
+    for social in result.get("social_handles") or []:
+        url = (social.get("url") or "")[:512]
+        if url and url not in rows:
+            rows[url] = {"brand_id": brand_id, "platform": social.get("platform"), "url": url}
+    upsert_rows(db, BrandSocialHandle, list(rows.values()), ["brand_id", "url"], ["platform"])
+    db.execute(delete(BrandSocialHandle).where(
+        BrandSocialHandle.brand_id == brand_id, BrandSocialHandle.url.notin_(list(rows))
+    ))
+
+def _replace_contacts(db: Session, brand_id: int, result: dict) -> None:
+    contact_info = result.get("contact_info") or {}
+    rows = []
+    for kind, key in (("email", "emails"), ("phone", "phones")):
+        for value in dict.fromkeys(contact_info.get(key) or []):
+            rows.append({"brand_id": brand_id, "kind": kind, "value": str(value)[:255]})
+    upsert_rows(db, BrandContact, rows, ["brand_id", "kind", "value"])
+    for kind in ("email", "phone"):
+        values = [row["value"] for row in rows if row["kind"] == kind]
+        db.execute(delete(BrandContact).where(
+            BrandContact.brand_id == brand_id, BrandContact.kind == kind, BrandContact.value.notin_(values)
+        ))
+
+# Result key -> writer for the matching normalized table (both policies share one table)
+SECTION_WRITERS = {
+    "products": _replace_products,
+    "privacy_policy": _replace_policies,
+    "return_refund_policy": _replace_policies,
+    "faqs": _replace_faqs,
+    "social_handles": _replace_socials,
+    "contact_info": _replace_contacts,
+}
+
+def save_brand_sections(db: Session, brand_id: int, result: dict, previous: Optional[dict] = None) -> List[str]:
+    """Write a scrape result into the normalized brand tables.
+
+    Only sections that differ from previous are rewritten. The caller commits.
+    Returns the list of sections written.
+    """
+    written = []
+    done = set()
+    for section, writer in SECTION_WRITERS.items():
+        if previous is not None and previous.get(section) == result.get(section):
+            continue
+        if writer in done:
+            continue
+        writer(db, brand_id, result)
+        done.add(writer)
+        written.append(section)
+    return written
+
+def save_stores(db: Session, results: List[dict], competitors: Optional[Dict[str, List[dict]]] = None,
+                previous: Optional[Dict[str, dict]] = None,
+                competitor_previous: Optional[Dict[str, Dict[str, dict]]] = None,
+                scraped_at: Optional[datetime] = None) -> Dict[str, int]:
+    """Persist many scraped stores and their competitors with bulk upserts.
+
+    results are brand scrape results; competitors maps a brand website to its
+    competitor results, previous / competitor_previous hold the stored data so
+    that unchanged blobs and sections are not rewritten. Every brand's
+    last_scraped_at is set to scraped_at (default now). Brand rows are
+    written with one upsert, their ids fetched with one SELECT, and all
+    competitor rows with one more upsert. The caller commits, so everything
+    lands in a single transaction. Returns {website: brand_id}.
+    """
+    competitors = competitors or {}
+    previous = previous or {}
+    competitor_previous = competitor_previous or {}
+    results = list({result["website"]: result for result in results}.values())
+    scraped_at = scraped_at or datetime.utcnow()
+
+    upsert_rows(db, BrandData, [
+        {"website": result["website"], "data": encode_blob(result), "last_scraped_at": scraped_at}
+        for result in results if previous.get(result["website"]) != result
+    ], ["website"], ["data", "last_scraped_at"])
+    unchanged = [result["website"] for result in results if previous.get(result["website"]) == result]
+    if unchanged:
+        # Still fresh even though nothing changed
+        db.execute(update(BrandData).where(BrandData.website.in_(unchanged)).values(last_scraped_at=scraped_at))
+    brand_ids = dict(db.execute(
+        select(BrandData.website, BrandData.id).where(BrandData.website.in_([r["website"] for r in results]))
+    ).all())
+    for result in results:
+        stored = previous.get(result["website"])
+        if stored != result:
+            save_brand_sections(db, brand_ids[result["website"]], result, stored)
+
+    competitor_rows = {}
+    for brand_website, comp_results in competitors.items():
+        stored = competitor_previous.get(brand_website) or {}
+        for comp_result in comp_results:
+            if "error" in comp_result or stored.get(comp_result["website"]) == comp_result:
+                continue
+            competitor_rows[(brand_website, comp_result["website"])] = {
+                "brand_website": brand_website,
+                "competitor_website": comp_result["website"],
+                "data": encode_blob(comp_result),
+            }
+    upsert_rows(db, CompetitorData, list(competitor_rows.values()),
+                ["brand_website", "competitor_website"], ["data"])
+    return brand_ids
+
+def save_store(db: Session, result: dict, comp_results: Sequence[dict] = (), previous: Optional[dict] = None,
+               competitor_previous: Optional[Dict[str, dict]] = None) -> int:
+    """Persist one brand and its competitors; see save_stores. Returns the brand id."""
+    website = result["website"]
+    brand_ids = save_stores(
+        db, [result], {website: list(comp_results)},
+        previous={website: previous} if previous is not None else None,
+        competitor_previous={website: competitor_previous or {}},
+    )
+    return brand_ids[website]
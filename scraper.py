@@ -1,27 +1,63 @@
 
 #scraper.py
-import requests
+import asyncio
+import hashlib
+import json
+import os
 from bs4 import BeautifulSoup
 import re
-from typing import List, Dict, Optional
-from models import Product, Policy, FAQ, SocialHandle, ContactInfo
-from urllib.parse import urljoin, urlparse
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, List, Dict, Optional, Tuple
+from models import Product, Policy, SocialHandle
+from urllib.parse import urlparse
+from html_extract import PageExtract, extract_page, extract_page_lxml
+from structured_data import contacts_from_page, faqs_from_page, organization_name, socials_from_page
+from sitemap import discover_sitemaps, product_lastmods
+from serialization import dumps
+from http_client import FetchSession, afetch, run_sync
+import llm_processor
 from llm_processor import (
-    clean_policy_text, 
-    extract_faqs, 
-    summarize_about_text, 
+    aclean_policy_text, 
+    aextract_faqs, 
+    asummarize_about_text, 
+    aprocess_store_sections,
+    dedupe_faqs,
+    final_hero_products,
+    is_fallback,
     validate_and_enhance_data,
     logger
 )
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
+def product_cap(value) -> Optional[int]:
+    """Catalog cap from a setting or CLI value; 0, negative or empty means the full catalog (None)"""
+    cap = int(value) if value not in (None, "") else 0
+    return cap if cap > 0 else None
+
+# Catalog crawl limits (products.json serves at most 250 products per page).
+# SCRAPER_MAX_PRODUCTS=0 crawls every product, for every entry point.
+CATALOG_PAGE_SIZE = 250
+MAX_PRODUCTS = product_cap(os.getenv("SCRAPER_MAX_PRODUCTS", "50"))
+MAX_CATALOG_PAGES = int(os.getenv("SCRAPER_MAX_CATALOG_PAGES", "200"))
+
+# Multi-store scraping: worker pool size and per-store timeout in seconds
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "4"))
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "90"))
+
+# HTML parser backend: "lxml" (parse events, no tree) or "bs4" (full BeautifulSoup tree)
+HTML_PARSER = os.getenv("SCRAPER_HTML_PARSER", "lxml").lower()
+# What each kind of page is parsed for
+PAGE_ROLES = ("homepage", "text")
 
-def get_json(url: str) -> dict:
-    """Fetch JSON data from URL"""
+# on_section(name, value): receives each result field as soon as it is ready
+SectionCallback = Callable[[str, Any], None]
+
+# Result key holding the per-section source hashes used by incremental scrapes.
+# It is stored with the result but is not part of the API output.
+FINGERPRINTS_KEY = "_fingerprints"
+
+async def aget_json(session: FetchSession, url: str) -> dict:
+    """Fetch JSON data from URL without blocking the event loop"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
+        r = await session.get(url)
         if r.status_code == 200:
             return r.json()
         else:
@@ -31,12 +67,29 @@ def get_json(url: str) -> dict:
         logger.error(f"Error fetching JSON from {url}: {e}")
         return {}
 
-def get_soup(url: str) -> Optional[BeautifulSoup]:
-    """Fetch and parse HTML from URL"""
+def parse_page(content: bytes, base_url: str = "", role: str = "text") -> PageExtract:
+    """Parse HTML for one page role with the configured HTML_PARSER backend.
+
+    role "text" (policy, FAQ and about pages) collects only the clean text;
+    "homepage" also collects links, social handles, product links, title and
+    og:site_name. BeautifulSoup is used when HTML_PARSER=bs4 or lxml fails.
+    """
+    if role not in PAGE_ROLES:
+        raise ValueError(f"Unknown page role: {role}")
+    text_only = role == "text"
+    if HTML_PARSER == "lxml":
+        try:
+            return extract_page_lxml(content, base_url, text_only)
+        except Exception as e:
+            logger.warning(f"lxml parsing failed for {base_url}, falling back to BeautifulSoup: {e}")
+    return extract_page(BeautifulSoup(content, 'lxml'), base_url, text_only)
+
+async def aget_page(session: FetchSession, url: str, role: str = "text") -> Optional[PageExtract]:
+    """Fetch and parse HTML from URL without blocking the event loop"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
+        r = await session.get(url)
         if r.status_code == 200:
-            return BeautifulSoup(r.content, 'lxml')
+            return parse_page(r.content, url, role)
         else:
             logger.warning(f"Failed to fetch HTML from {url}: {r.status_code}")
             return None
@@ -44,192 +97,379 @@ def get_soup(url: str) -> Optional[BeautifulSoup]:
         logger.error(f"Error fetching HTML from {url}: {e}")
         return None
 
-def extract_clean_text(soup: BeautifulSoup) -> str:
-    """Extract clean text from BeautifulSoup object"""
-    if not soup:
-        return ""
-    
-    # Remove script and style elements
-    for script in soup(["script", "style", "nav", "header", "footer"]):
-        script.decompose()
-    
-    # Get text and clean it
-    text = soup.get_text()
-    
-    # Clean up whitespace
-    lines = (line.strip() for line in text.splitlines())
-    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-    text = ' '.join(chunk for chunk in chunks if chunk)
-    
-    return text
+def parse_product(p: dict) -> Optional[Product]:
+    """Build a Product from a products.json entry"""
+    try:
+        price = "N/A"
+        if p.get("variants") and len(p["variants"]) > 0:
+            price = p["variants"][0].get("price", "N/A")
+        
+        image = None
+        if p.get("images") and len(p["images"]) > 0:
+            image = p["images"][0].get("src")
+        
+        return Product(
+            title=p.get("title", "Unnamed Product"),
+            handle=p.get("handle", ""),
+            price=str(price),
+            image=image,
+            id=p.get("id"),
+            updated_at=p.get("updated_at")
+        )
+    except Exception as e:
+        logger.warning(f"Error processing product: {e}")
+        return None
 
-def scrape_shopify_store(base_url: str) -> dict:
-    """Main scraping function with improved error handling and data processing"""
+async def _fetch_catalog_page(url: str) -> list:
+    try:
+        r = await afetch(url)
+        if r.status_code == 200:
+            return r.json().get("products", [])
+        logger.warning(f"Failed to fetch catalog page {url}: {r.status_code}")
+    except Exception as e:
+        logger.error(f"Error fetching catalog page {url}: {e}")
+    return []
+
+async def aiter_catalog(base_url: str, max_products: Optional[int] = None,
+                        max_pages: int = MAX_CATALOG_PAGES,
+                        page_size: int = CATALOG_PAGE_SIZE,
+                        paginate: str = "page") -> AsyncIterator[Product]:
+    """Stream the full products.json catalog, one page in memory plus one prefetched.
+
+    paginate is "page" (?page=N) or "since_id" (?since_id=<last id>) for stores
+    that cap page-based offsets.
+    """
+    base_url = base_url.rstrip("/")
+    max_products = product_cap(max_products)
+    if max_products is not None:
+        page_size = max(1, min(page_size, max_products))
+
+    def page_url(page: int, since_id=None) -> str:
+        if paginate == "since_id":
+            return f"{base_url}/products.json?limit={page_size}&since_id={since_id or 0}"
+        return f"{base_url}/products.json?limit={page_size}&page={page}"
+
+    count = 0
+    page = 1
+    seen_first_ids = set()
+    next_task = asyncio.create_task(_fetch_catalog_page(page_url(page)))
+    try:
+        while next_task is not None:
+            items = await next_task
+            next_task = None
+            if not items:
+                break
+
+            # Some stores ignore the page parameter and serve page 1 forever
+            first_id = items[0].get("id")
+            if first_id is not None and first_id in seen_first_ids:
+                break
+            seen_first_ids.add(first_id)
+
+            # Prefetch the next page while this one is consumed
+            more_wanted = max_products is None or count + len(items) < max_products
+            if more_wanted and len(items) >= page_size and page < max_pages:
+                page += 1
+                next_task = asyncio.create_task(_fetch_catalog_page(page_url(page, items[-1].get("id"))))
+
+            for p in items:
+                if max_products is not None and count >= max_products:
+                    logger.info(f"Catalog crawl stopped at cap of {max_products} products")
+                    return
+                product = parse_product(p)
+                if product:
+                    count += 1
+                    yield product
+            del items
+    finally:
+        if next_task is not None:
+            next_task.cancel()
+
+def iter_catalog(base_url: str, max_products: Optional[int] = None, **kwargs) -> Iterator[Product]:
+    """Sync generator over aiter_catalog; prefetching continues on the shared loop"""
+    agen = aiter_catalog(base_url, max_products=max_products, **kwargs)
+    try:
+        while True:
+            try:
+                yield run_sync(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(agen.aclose())
+
+def normalize_url(base_url: str) -> str:
+    """Canonical store URL, as stored in the website column"""
     base_url = base_url.strip().rstrip("/")
     if not base_url.startswith("http"):
         base_url = "https://" + base_url
+    return base_url
 
-    logger.info(f"Starting scrape of: {base_url}")
+def fingerprint(value) -> str:
+    """Stable content hash used to detect unchanged sections between scrapes"""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
 
-    # Validate website accessibility
+def section_fingerprint(raw_text: str) -> str:
+    """fingerprint of a section's source text and of the model and prompts that process it,
+    so a model or prompt change invalidates the stored result"""
+    return fingerprint([raw_text, llm_processor.MODEL, llm_processor.PROMPT_VERSIONS])
+
+# Shopify serves policies and pages at fixed paths, so these are tried
+# before guessing from homepage link texts
+POLICY_PATHS = {
+    "privacy_policy": ["/policies/privacy-policy"],
+    "return_refund_policy": ["/policies/refund-policy"],
+}
+PAGE_PATHS = {
+    "faqs": ["/pages/faq", "/pages/faqs", "/pages/frequently-asked-questions"],
+    "about_brand": ["/pages/about-us", "/pages/about", "/pages/our-story"],
+}
+# Sitemap-listed pages tried per section before giving up on it
+SITEMAP_CANDIDATES = 3
+
+async def probe_page(session: FetchSession, url: str) -> Optional[PageExtract]:
+    """Parse url if it exists; misses are expected here, so they are not logged as errors"""
     try:
-        res = requests.get(base_url, headers=HEADERS, timeout=15)
-        if res.status_code != 200:
-            return {"error": f"Website returned status {res.status_code}", "status_code": res.status_code}
+        r = await session.get(url)
     except Exception as e:
-        logger.error(f"Connection failed: {e}")
-        return {"error": f"Unable to connect: {str(e)}", "status_code": 404}
+        logger.info(f"Discovery request failed for {url}: {e}")
+        return None
+    # Unset policies and unknown pages may redirect elsewhere (e.g. the homepage)
+    if r.status_code != 200 or urlparse(str(r.url)).path.rstrip("/") != urlparse(url).path.rstrip("/"):
+        return None
+    return parse_page(r.content, url)
 
-    soup = get_soup(base_url)
-    if not soup:
-        return {"error": "Failed to load homepage", "status_code": 500}
+async def discover_page(session: FetchSession, urls: List[str],
+                        accept: Callable[[PageExtract], bool]) -> Optional[Tuple[str, PageExtract]]:
+    """First of urls that exists and is accepted; returns (url, page)"""
+    for url in urls:
+        page = await probe_page(session, url)
+        if page and accept(page):
+            return url, page
+    return None
 
-    parsed = urlparse(base_url)
-    domain = f"{parsed.scheme}://{parsed.netloc}"
+async def discover_store(session: FetchSession, domain: str) -> Dict[str, Any]:
+    """Fetch /meta.json, the sitemaps and the well-known policy and page paths concurrently.
 
-    # 1. Products with better error handling
-    logger.info("Fetching products...")
-    product_json = get_json(f"{base_url}/products.json")
-    products = []
-    
-    for p in product_json.get("products", [])[:50]:  # Limit to 50 products
-        try:
-            price = "N/A"
-            if p.get("variants") and len(p["variants"]) > 0:
-                price = p["variants"][0].get("price", "N/A")
-            
-            image = None
-            if p.get("images") and len(p["images"]) > 0:
-                image = p["images"][0].get("src")
-            
-            products.append(Product(
-                title=p.get("title", "Unnamed Product"),
-                handle=p.get("handle", ""),
-                price=str(price),
-                image=image
-            ).model_dump())
-        except Exception as e:
-            logger.warning(f"Error processing product: {e}")
-            continue
+    Returns {"meta": dict, "sitemap": SitemapDiscovery, <section>: (url, PageExtract) or None}
+    for the sections in POLICY_PATHS and PAGE_PATHS. Pages the sitemap lists
+    for a section are tried before the well-known paths; once a pages sitemap
+    has been read, well-known page paths it does not list are not probed.
+    """
+    # Same content checks the link-text search applies
+    accept = {
+        "privacy_policy": lambda page: len(page.text) > 200,
+        "return_refund_policy": lambda page: len(page.text) > 200,
+        "faqs": lambda page: len(page.text) > 300 or bool(faqs_from_page(page)),
+        "about_brand": lambda page: len(page.text) > 200,
+    }
+    sitemap_task = session.create_task(discover_sitemaps(session, domain))
 
-    logger.info(f"Found {len(products)} products")
+    async def discover_section(section: str) -> Optional[Tuple[str, PageExtract]]:
+        if section in POLICY_PATHS:
+            # Policies are not listed in Shopify sitemaps
+            return await discover_page(session, [domain + path for path in POLICY_PATHS[section]], accept[section])
+        sitemap = await sitemap_task
+        listed = sitemap.pages.get(section, [])[:SITEMAP_CANDIDATES]
+        guessed = [] if sitemap.pages_listed else [domain + path for path in PAGE_PATHS[section]]
+        return await discover_page(session, listed + [url for url in guessed if url not in listed], accept[section])
+
+    sections = list(POLICY_PATHS) + list(PAGE_PATHS)
+    results = await asyncio.gather(
+        aget_json(session, f"{domain}/meta.json"),
+        *(discover_section(section) for section in sections),
+    )
+    discovered = dict(zip(sections, results[1:]))
+    discovered["meta"] = results[0] if isinstance(results[0], dict) else {}
+    discovered["sitemap"] = await sitemap_task
+    found = [section for section in sections if discovered[section]]
+    logger.info(f"Discovered via sitemap and well-known paths: {', '.join(found) or 'nothing'}")
+    return discovered
+
+def scrape_shopify_store(base_url: str, max_products: Optional[int] = MAX_PRODUCTS,
+                         previous: Optional[dict] = None) -> dict:
+    """Main scraping function with improved error handling and data processing"""
+    return run_sync(async_scrape_shopify_store(base_url, max_products, previous))
+
+async def async_scrape_shopify_store(base_url: str, max_products: Optional[int] = MAX_PRODUCTS,
+                                     previous: Optional[dict] = None,
+                                     on_section: Optional[SectionCallback] = None) -> dict:
+    """Concurrent scraping engine: independent pages are fetched in parallel.
+
+    previous is the last stored result for this store. Sections whose source
+    text has the same fingerprint as last time reuse the stored value instead
+    of going through the LLM again. on_section(name, value) is called with
+    each top-level field of the result as soon as it is known, homepage
+    fields first and LLM-processed sections last.
+    """
+    base_url = normalize_url(base_url)
 
-    # 2. Hero Products (featured on homepage)
-    hero_products = []
+    logger.info(f"Starting scrape of: {base_url}")
+
+    session = FetchSession()
     try:
-        product_links = soup.find_all("a", href=re.compile(r"/products/"))
-        seen_handles = set()
-        
-        for link in product_links:
-            if len(hero_products) >= 10:  # Limit hero products
-                break
-                
+        return await _scrape_store(session, base_url, max_products, previous, on_section)
+    finally:
+        # Stop any downloads still running after an early return, timeout or cancellation
+        session.cancel()
+
+async def _scrape_store(session: FetchSession, base_url: str, max_products: Optional[int],
+                        previous: Optional[dict], on_section: Optional[SectionCallback]) -> dict:
+    max_products = product_cap(max_products)
+    # Results stored before the key was made private use "section_fingerprints"
+    previous_fingerprints = (previous or {}).get(FINGERPRINTS_KEY) or (previous or {}).get("section_fingerprints", {})
+    fingerprints = {}
+
+    def emit(section: str, value) -> None:
+        if on_section:
             try:
-                href = link.get('href', '')
-                handle = href.split("/products/")[-1].split("?")[0].split("#")[0]
-                
-                if handle and handle not in seen_handles:
-                    seen_handles.add(handle)
-                    matched = [p for p in products if p["handle"] == handle]
-                    if matched:
-                        hero_products.append(matched[0])
+                on_section(section, value)
             except Exception as e:
-                logger.warning(f"Error processing product link: {e}")
-                continue
-    except Exception as e:
-        logger.error(f"Error finding hero products: {e}")
+                logger.warning(f"Section callback failed for {section}: {e}")
+
+    async def emitted(section: str, awaitable):
+        value = await awaitable
+        emit(section, value)
+        return value
+
+    def unchanged(section: str, raw_text: str) -> bool:
+        """Record the section's source fingerprint; True if it matches the previous scrape
+        and the stored result is worth reusing (not empty or a fallback placeholder)"""
+        fingerprints[section] = section_fingerprint(raw_text)
+        if (previous and not is_fallback(previous.get(section))
+                and previous_fingerprints.get(section) == fingerprints[section]):
+            logger.info(f"{section} unchanged since last scrape, reusing stored result")
+            return True
+        return False
 
-    # 3. Extract all links with better categorization
-    logger.info("Extracting navigation links...")
-    links = {}
+    async def after_homepage(factory: Callable[[], Awaitable[Any]]):
+        """Run factory() once the homepage has answered with 200.
+
+        A dead or non-store URL then costs the homepage retries alone, not
+        those of every sitemap, policy and catalog request started with it.
+        """
+        try:
+            reachable = (await session.get(base_url)).status_code == 200
+        except Exception:
+            reachable = False
+        if not reachable:
+            return None  # the scrape returns an error without reading this
+        # Created only now, so a task cancelled while waiting leaves no coroutine behind
+        return await factory()
+
+    parsed = urlparse(base_url)
+    domain = f"{parsed.scheme}://{parsed.netloc}"
+    # Sitemaps and well-known Shopify endpoints are probed while the homepage is parsed
+    discovery_task = session.create_task(after_homepage(lambda: discover_store(session, domain)))
+
+    def catalog_requests(product_count: int) -> int:
+        """products.json requests a crawl that found product_count products takes"""
+        page_size = min(CATALOG_PAGE_SIZE, max_products) if max_products else CATALOG_PAGE_SIZE
+        if max_products and product_count >= max_products:
+            return -(-max_products // page_size)
+        return min(product_count // page_size + 1, MAX_CATALOG_PAGES)  # the last page is short or empty
+
+    async def catalog_unchanged(product_count: int) -> bool:
+        """Compare product sitemap lastmods with the previous scrape.
+
+        Only worth it when the product sitemaps are fewer requests than
+        crawling a catalog of product_count products; each sitemap lists up
+        to 5000 of them.
+        """
+        product_sitemaps = (await discovery_task)["sitemap"].product_sitemaps
+        if not product_sitemaps or len(product_sitemaps) >= catalog_requests(product_count):
+            return False
+        lastmods = await product_lastmods(session, product_sitemaps)
+        if not lastmods:
+            return False
+        fingerprints["product_sitemap"] = fingerprint([max_products, sorted(lastmods.items())])
+        return previous_fingerprints.get("product_sitemap") == fingerprints["product_sitemap"]
+
+    # The catalog does not depend on the homepage content, so crawl it while that is parsed
+    async def fetch_products() -> List[Dict]:
+        if previous and previous.get("products") and previous_fingerprints.get("product_sitemap"):
+            if await catalog_unchanged(len(previous["products"])):
+                logger.info("Product sitemap unchanged since last scrape, reusing stored products")
+                return previous["products"]
+            return [product.model_dump() async for product in aiter_catalog(base_url, max_products)]
+        # Nothing to compare against: crawl, then record the sitemap fingerprint
+        # when checking it next time is cheaper than this crawl was
+        products = [product.model_dump() async for product in aiter_catalog(base_url, max_products)]
+        await catalog_unchanged(len(products))
+        return products
+
+    products_task = session.create_task(after_homepage(fetch_products))
+
+    # Validate website accessibility (the response is reused for parsing below)
     try:
-        for a in soup.find_all('a', href=True):
-            text = a.get_text().strip().lower()
-            href = a.get('href', '')
-            
-            if text and len(text) < 100:  # Avoid very long link texts
-                full_url = urljoin(base_url, href)
-                links[text] = full_url
+        res = await session.get(base_url)
+        if res.status_code != 200:
+            return {"error": f"Website returned status {res.status_code}", "status_code": res.status_code}
     except Exception as e:
-        logger.error(f"Error extracting links: {e}")
+        logger.error(f"Connection failed: {e}")
+        return {"error": f"Unable to connect: {str(e)}", "status_code": 404}
 
-    # 4. Policy extraction with better URL matching
-    def fetch_policy(keywords: List[str]) -> Optional[Dict]:
-        """Fetch policy with multiple keyword options"""
-        for text, url in links.items():
-            if any(keyword in text for keyword in keywords):
-                logger.info(f"Found policy page: {url}")
-                page_soup = get_soup(url)
-                if page_soup:
-                    raw_text = extract_clean_text(page_soup)
-                    if len(raw_text) > 200:  # Ensure we have substantial content
-                        cleaned_content = clean_policy_text(raw_text)
-                        return Policy(url=url, content=cleaned_content).model_dump()
-        return None
+    homepage = await aget_page(session, base_url, "homepage")
+    if not homepage:
+        return {"error": "Failed to load homepage", "status_code": 500}
 
-    logger.info("Extracting policies...")
-    privacy_policy = fetch_policy(["privacy", "privacy policy", "data protection"])
-    refund_policy = fetch_policy(["refund", "return", "returns", "exchange", "refund policy", "return policy"])
+    # 1-2. Links, social handles, product links and page text in one pass over the homepage
+    logger.info("Extracting links, social media handles and page text...")
+    links = homepage.links
+    # Structured data (JSON-LD sameAs) first, then social links found on the page
+    socials = []
+    seen_profiles = set()
+    for social in socials_from_page(homepage) + homepage.socials:
+        profile = re.sub(r"^https?://(www\.)?", "", social["url"].lower()).rstrip("/")
+        if profile not in seen_profiles:
+            seen_profiles.add(profile)
+            socials.append(SocialHandle(**social).model_dump())
+    hero_hrefs = homepage.product_hrefs
 
-    # 5. FAQ extraction with multiple attempts
-    logger.info("Extracting FAQs...")
-    faqs = []
-    
-    # Try dedicated FAQ page first
-    faq_keywords = ["faq", "frequently asked", "questions", "help", "support"]
-    faq_page_found = False
-    
-    for text, url in links.items():
-        if any(keyword in text for keyword in faq_keywords) and not faq_page_found:
-            logger.info(f"Found FAQ page: {url}")
-            faq_soup = get_soup(url)
-            if faq_soup:
-                raw_faq_text = extract_clean_text(faq_soup)
-                if len(raw_faq_text) > 300:
-                    faqs = extract_faqs(raw_faq_text)
-                    faq_page_found = True
-                    break
-    
-    # If no dedicated FAQ page, try to extract from main pages
-    if not faqs:
-        logger.info("No dedicated FAQ page found, trying main content...")
-        main_text = extract_clean_text(soup)
-        if len(main_text) > 500:
-            faqs = extract_faqs(main_text)
+    # 3. Brand name extraction with fallbacks
+    brand_name = "Unknown Brand"
+    try:
+        # The shop name from /meta.json is authoritative (same download as
+        # discovery's, so this does not wait for the page probes)
+        meta = await aget_json(session, f"{domain}/meta.json")
+        shop_name = meta.get("name") if isinstance(meta, dict) else None
+        if isinstance(shop_name, str) and shop_name.strip():
+            brand_name = shop_name.strip()
 
-    logger.info(f"Found {len(faqs)} FAQs")
+        # Then the title tag
+        if homepage.title and brand_name == "Unknown Brand":
+            brand_name = homepage.title.split("|")[0].split("-")[0].strip()
+        
+        # Try og:site_name meta tag
+        if not brand_name or brand_name == "Unknown Brand":
+            if homepage.og_site_name:
+                brand_name = homepage.og_site_name.strip()
+        
+        # Try the JSON-LD Organization name
+        if not brand_name or brand_name == "Unknown Brand":
+            brand_name = organization_name(homepage) or brand_name
+        
+        # Fallback to domain name
+        if not brand_name or brand_name == "Unknown Brand":
+            brand_name = domain.split("//")[1].split(".")[0].title()
+            
+    except Exception as e:
+        logger.error(f"Error extracting brand name: {e}")
 
-    # 6. Social media handles with better validation
-    logger.info("Extracting social media links...")
-    socials = []
-    social_patterns = {
-        r'instagram\.com': 'Instagram',
-        r'facebook\.com': 'Facebook', 
-        r'tiktok\.com': 'TikTok',
-        r'twitter\.com': 'Twitter',
-        r'youtube\.com': 'YouTube',
-        r'linkedin\.com': 'LinkedIn',
-        r'pinterest\.com': 'Pinterest'
-    }
-    
-    seen_urls = set()
-    
-    for a in soup.find_all("a", href=True):
-        href = a.get('href', '')
-        if href and href not in seen_urls:
-            for pattern, platform in social_patterns.items():
-                if re.search(pattern, href, re.IGNORECASE):
-                    seen_urls.add(href)
-                    socials.append(SocialHandle(platform=platform, url=href).model_dump())
-                    break
+    emit("brand_name", brand_name)
+    emit("website", base_url)
+    emit("social_handles", socials)
 
-    # 7. Contact information extraction
+    # 4. Contact information extraction
     logger.info("Extracting contact information...")
-    body_text = extract_clean_text(soup)
+    body_text = homepage.text
+    # Structured contact details (JSON-LD Organization / contactPoint) come first
+    structured_emails, structured_phones = contacts_from_page(homepage)
     
     # Email extraction with better patterns
     email_pattern = r'\b[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\b'
-    emails = list(set(re.findall(email_pattern, body_text)))
+    emails = list(dict.fromkeys(structured_emails + list(set(re.findall(email_pattern, body_text)))))
     
     # Filter out common false positives
     filtered_emails = [email for email in emails 
@@ -246,21 +486,197 @@ def scrape_shopify_store(base_url: str) -> dict:
     for pattern in phone_patterns:
         phones.extend(re.findall(pattern, body_text))
     
-    phones = list(set(phones))  # Remove duplicates
+    phones = list(dict.fromkeys(structured_phones + list(set(phones))))  # Remove duplicates
 
-    # 8. About brand information
-    logger.info("Extracting brand information...")
-    about_text = "Not available."
-    
-    about_keywords = ["about", "our story", "about us", "who we are", "mission"]
-    for text, url in links.items():
-        if any(keyword in text for keyword in about_keywords):
-            about_soup = get_soup(url)
-            if about_soup:
-                raw_about = extract_clean_text(about_soup)
-                if len(raw_about) > 200:
-                    about_text = summarize_about_text(raw_about)
+    contact_info = {"emails": filtered_emails, "phones": phones}
+    emit("contact_info", contact_info)
+
+    # 5. Hero Products (featured on homepage)
+    def find_hero_products(products: List[Dict]) -> List[Dict]:
+        hero_products = []
+        try:
+            seen_handles = set()
+        
+            for href in hero_hrefs:
+                if len(hero_products) >= 10:  # Limit hero products
                     break
+                
+                try:
+                    handle = href.split("/products/")[-1].split("?")[0].split("#")[0]
+                
+                    if handle and handle not in seen_handles:
+                        seen_handles.add(handle)
+                        matched = [p for p in products if p["handle"] == handle]
+                        if matched:
+                            hero_products.append(matched[0])
+                except Exception as e:
+                    logger.warning(f"Error processing product link: {e}")
+                    continue
+        except Exception as e:
+            logger.error(f"Error finding hero products: {e}")
+        return hero_products
+
+    async def fetch_products_and_heroes() -> List[Dict]:
+        products = await emitted("products", products_task)
+        emit("hero_products", final_hero_products(products, find_hero_products(products)))
+        return products
+
+    # 6. Policy extraction with better URL matching
+    async def find_policy(section: str, keywords: List[str]) -> Optional[Tuple[str, str]]:
+        """Find a policy page, by its Shopify path or by link text; returns (url, raw text)"""
+        discovered = (await discovery_task)[section]
+        if discovered:
+            url, page = discovered
+            logger.info(f"Found policy page: {url}")
+            return url, page.text
+        for text, url in links.items():
+            if any(keyword in text for keyword in keywords):
+                logger.info(f"Found policy page: {url}")
+                page = await aget_page(session, url)
+                if page:
+                    raw_text = page.text
+                    if len(raw_text) > 200:  # Ensure we have substantial content
+                        return url, raw_text
+        return None
+
+    async def fetch_policy(section: str, keywords: List[str]) -> Optional[Dict]:
+        found = await find_policy(section, keywords)
+        if not found:
+            return None
+        url, raw_text = found
+        if unchanged(section, raw_text):
+            return Policy(url=url, content=previous[section].get("content")).model_dump()
+        cleaned_content = await aclean_policy_text(raw_text)
+        return Policy(url=url, content=cleaned_content).model_dump()
+
+    # 7. FAQ extraction with multiple attempts
+    async def find_faq_page() -> Tuple[Optional[str], List[Dict]]:
+        """(raw text, structured FAQs) of the dedicated FAQ page"""
+        discovered = (await discovery_task)["faqs"]
+        if discovered:
+            url, faq_page = discovered
+            logger.info(f"Found FAQ page: {url}")
+            return faq_page.text, faqs_from_page(faq_page)
+        faq_keywords = ["faq", "frequently asked", "questions", "help", "support"]
+        
+        for text, url in links.items():
+            if any(keyword in text for keyword in faq_keywords):
+                logger.info(f"Found FAQ page: {url}")
+                faq_page = await aget_page(session, url)
+                if faq_page:
+                    structured = faqs_from_page(faq_page)
+                    if structured or len(faq_page.text) > 300:
+                        return faq_page.text, structured
+        return None, []
+
+    homepage_faqs = faqs_from_page(homepage)
+
+    def homepage_faq_text() -> Optional[str]:
+        logger.info("No dedicated FAQ page found, trying main content...")
+        main_text = homepage.text
+        return main_text if len(main_text) > 500 else None
+
+    async def fetch_faqs() -> List[Dict]:
+        faqs = []
+        # Try dedicated FAQ page first; structured FAQs need no LLM call
+        raw_faq_text, structured = await find_faq_page()
+        if structured or homepage_faqs:
+            logger.info("Using FAQs from structured data")
+            return structured or homepage_faqs
+        if raw_faq_text:
+            if unchanged("faqs", raw_faq_text):
+                return previous["faqs"]
+            faqs = await aextract_faqs(raw_faq_text)
+        
+        # If no dedicated FAQ page, try to extract from main pages
+        if not faqs:
+            main_text = homepage_faq_text()
+            if main_text:
+                if unchanged("faqs", main_text):
+                    return previous["faqs"]
+                faqs = await aextract_faqs(main_text)
+
+        logger.info(f"Found {len(faqs)} FAQs")
+        return faqs
+
+    async def fetch_faqs_deduped() -> List[Dict]:
+        # Streamed as in the final result, see validate_and_enhance_data
+        return dedupe_faqs(await fetch_faqs())
+
+    # 8. About brand information
+    async def find_about_text() -> Optional[str]:
+        discovered = (await discovery_task)["about_brand"]
+        if discovered:
+            return discovered[1].text
+        about_keywords = ["about", "our story", "about us", "who we are", "mission"]
+        for text, url in links.items():
+            if any(keyword in text for keyword in about_keywords):
+                about_page = await aget_page(session, url)
+                if about_page:
+                    raw_about = about_page.text
+                    if len(raw_about) > 200:
+                        return raw_about
+        return None
+
+    async def fetch_about() -> str:
+        raw_about = await find_about_text()
+        if not raw_about:
+            return "Not available."
+        if unchanged("about_brand", raw_about):
+            return previous["about_brand"]
+        return await asummarize_about_text(raw_about)
+
+    # Policies, FAQs and the about page are independent of each other
+    logger.info("Extracting policies, FAQs and brand information...")
+    if llm_processor.LLM_BATCH_MODE:
+        # Collect raw text for every section, then process it all in one LLM call
+        products, privacy_found, refund_found, (raw_faq_text, structured_faqs), raw_about = await asyncio.gather(
+            fetch_products_and_heroes(),
+            find_policy("privacy_policy", ["privacy", "privacy policy", "data protection"]),
+            find_policy("return_refund_policy", ["refund", "return", "returns", "exchange", "refund policy", "return policy"]),
+            find_faq_page(),
+            find_about_text(),
+        )
+        sections = {
+            "privacy_policy": privacy_found[1] if privacy_found else None,
+            "return_refund_policy": refund_found[1] if refund_found else None,
+            "faqs": None if structured_faqs or homepage_faqs else raw_faq_text or homepage_faq_text(),
+            "about_brand": raw_about,
+        }
+        reused = {}
+        for section, raw_text in sections.items():
+            if raw_text and unchanged(section, raw_text):
+                stored = previous[section]
+                reused[section] = stored.get("content") if section in ("privacy_policy", "return_refund_policy") else stored
+        processed = await aprocess_store_sections(
+            {section: raw_text for section, raw_text in sections.items() if section not in reused}
+        )
+        processed.update(reused)
+        privacy_policy = Policy(url=privacy_found[0], content=processed["privacy_policy"]).model_dump() if privacy_found else None
+        refund_policy = Policy(url=refund_found[0], content=processed["return_refund_policy"]).model_dump() if refund_found else None
+        faqs = structured_faqs or homepage_faqs or processed.get("faqs", [])
+        about_text = processed.get("about_brand", "Not available.")
+        logger.info(f"Found {len(faqs)} FAQs")
+        for section, value in (("privacy_policy", privacy_policy), ("return_refund_policy", refund_policy),
+                               ("faqs", dedupe_faqs(faqs)), ("about_brand", about_text)):
+            emit(section, value)
+    else:
+        products, privacy_policy, refund_policy, faqs, about_text = await asyncio.gather(
+            fetch_products_and_heroes(),
+            emitted("privacy_policy", fetch_policy("privacy_policy", ["privacy", "privacy policy", "data protection"])),
+            emitted("return_refund_policy", fetch_policy("return_refund_policy", ["refund", "return", "returns", "exchange", "refund policy", "return policy"])),
+            emitted("faqs", fetch_faqs_deduped()),
+            emitted("about_brand", fetch_about()),
+        )
+
+    # A section that failed this time must be processed again next time
+    for section, value in (("privacy_policy", privacy_policy), ("return_refund_policy", refund_policy),
+                           ("faqs", faqs), ("about_brand", about_text)):
+        if is_fallback(value):
+            fingerprints.pop(section, None)
+
+    logger.info(f"Found {len(products)} products")
+    hero_products = find_hero_products(products)
 
     # 9. Important links categorization
     important_links = {}
@@ -278,26 +694,12 @@ def scrape_shopify_store(base_url: str) -> dict:
                 important_links[category] = url
                 break
 
-    # 10. Brand name extraction with fallbacks
-    brand_name = "Unknown Brand"
-    try:
-        # Try title tag first
-        title_tag = soup.find("title")
-        if title_tag and title_tag.text:
-            brand_name = title_tag.text.split("|")[0].split("-")[0].strip()
-        
-        # Try og:site_name meta tag
-        if not brand_name or brand_name == "Unknown Brand":
-            og_site = soup.find("meta", property="og:site_name")
-            if og_site and og_site.get("content"):
-                brand_name = og_site["content"].strip()
-        
-        # Fallback to domain name
-        if not brand_name or brand_name == "Unknown Brand":
-            brand_name = domain.split("//")[1].split(".")[0].title()
-            
-    except Exception as e:
-        logger.error(f"Error extracting brand name: {e}")
+    # Pages the sitemap lists fill categories the homepage does not link to
+    sitemap_pages = (await discovery_task)["sitemap"].pages
+    for category in link_categories:
+        if category not in important_links and sitemap_pages.get(category):
+            important_links[category] = sitemap_pages[category][0]
+    emit("important_links", important_links)
 
     # Compile final data
     scraped_data = {
@@ -309,9 +711,10 @@ def scrape_shopify_store(base_url: str) -> dict:
         "return_refund_policy": refund_policy,
         "faqs": faqs,
         "social_handles": socials,
-        "contact_info": {"emails": filtered_emails, "phones": phones},
+        "contact_info": contact_info,
         "about_brand": about_text,
-        "important_links": important_links
+        "important_links": important_links,
+        FINGERPRINTS_KEY: fingerprints
     }
 
     # Final validation and enhancement
@@ -320,4 +723,173 @@ def scrape_shopify_store(base_url: str) -> dict:
     logger.info(f"Scraping completed for {brand_name}")
     logger.info(f"Summary: {len(products)} products, {len(faqs)} FAQs, {len(socials)} social links")
     
-    return validated_data
\ No newline at end of file
+    return validated_data
+
+async def _scrape_one(url: str, timeout: Optional[float], previous: Optional[dict],
+                      max_products: Optional[int] = MAX_PRODUCTS) -> dict:
+    """One store scrape for the multi-store runners; failures come back as error dicts"""
+    try:
+        result = await asyncio.wait_for(async_scrape_shopify_store(url, max_products, previous), timeout)
+        if "error" in result:
+            result.setdefault("website", url)
+        return result
+    except asyncio.TimeoutError:
+        logger.warning(f"Scrape of {url} timed out after {timeout}s")
+        return {"error": f"Timed out after {timeout}s", "status_code": 504, "website": url}
+    except Exception as e:
+        logger.error(f"Scrape of {url} failed: {e}")
+        return {"error": str(e), "status_code": 500, "website": url}
+
+async def async_scrape_many(urls: List[str], concurrency: int = SCRAPE_CONCURRENCY,
+                            timeout: Optional[float] = SCRAPE_TIMEOUT,
+                            previous: Optional[Dict[str, dict]] = None) -> List[dict]:
+    """Scrape several stores on a bounded pool; failures come back as error dicts.
+
+    previous optionally maps normalized store URLs to their last stored result.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    previous = previous or {}
+
+    async def scrape_one(url: str) -> dict:
+        async with semaphore:
+            return await _scrape_one(url, timeout, previous.get(normalize_url(url)))
+
+    return await asyncio.gather(*(scrape_one(url) for url in urls))
+
+async def aiter_scrape_many(urls: List[str], concurrency: int = SCRAPE_CONCURRENCY,
+                            timeout: Optional[float] = SCRAPE_TIMEOUT,
+                            previous: Optional[Dict[str, dict]] = None,
+                            max_products: Optional[int] = MAX_PRODUCTS) -> AsyncIterator[dict]:
+    """async_scrape_many for long URL lists: results are yielded as they complete.
+
+    A fixed pool of concurrency workers pulls URLs, so only that many
+    scrapes exist at a time however long the list is.
+    """
+    previous = previous or {}
+    pending = iter(urls)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        for url in pending:
+            await results.put(await _scrape_one(url, timeout, previous.get(normalize_url(url)), max_products))
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(concurrency, len(urls))))]
+    try:
+        for _ in range(len(urls)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+
+async def async_scrape_with_competitors(base_url: str, competitor_urls: List[str],
+                                        concurrency: int = SCRAPE_CONCURRENCY,
+                                        timeout: Optional[float] = SCRAPE_TIMEOUT,
+                                        previous: Optional[dict] = None,
+                                        competitor_previous: Optional[Dict[str, dict]] = None,
+                                        on_section: Optional[SectionCallback] = None) -> Tuple[dict, List[dict]]:
+    """Scrape a brand and its competitors at the same time.
+
+    The brand scrape is not subject to the per-competitor timeout; on_section
+    receives the brand's sections only.
+    """
+    competitors_task = asyncio.create_task(
+        async_scrape_many(competitor_urls, concurrency, timeout, competitor_previous)
+    )
+    try:
+        result = await async_scrape_shopify_store(base_url, previous=previous, on_section=on_section)
+    except BaseException:
+        competitors_task.cancel()
+        raise
+    if "error" in result:
+        competitors_task.cancel()
+        return result, []
+    return result, await competitors_task
+
+def scrape_with_competitors(base_url: str, competitor_urls: List[str], **kwargs) -> Tuple[dict, List[dict]]:
+    """Sync wrapper for async_scrape_with_competitors"""
+    return run_sync(async_scrape_with_competitors(base_url, competitor_urls, **kwargs))
+
+def read_url_list(path: str) -> List[str]:
+    """Store URLs from a text file, one per line; blank lines and # comments are skipped"""
+    with open(path, encoding="utf-8") as f:
+        urls = [line.split("#", 1)[0].strip() for line in f]
+    return list(dict.fromkeys(normalize_url(url) for url in urls if url))
+
+def read_checkpoint(path: str) -> set:
+    """Websites already scraped successfully into an NDJSON results file.
+
+    The file is compacted to one successful line per website: failed results
+    (retried by the next run), duplicates and lines cut short by an
+    interrupted run are dropped, so reruns do not pile up lines.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    kept, dropped = [], 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                result = None  # a line cut short by an interrupted run
+            if not isinstance(result, dict) or not result.get("website") or "error" in result:
+                dropped += 1
+                continue
+            website = normalize_url(result["website"])
+            if website in done:
+                dropped += 1
+                continue
+            done.add(website)
+            kept.append(line)
+    if dropped or (kept and not kept[-1].endswith(b"\n")):
+        logger.info(f"Dropping {dropped} failed or duplicate lines from {path}")
+        kept = [line if line.endswith(b"\n") else line + b"\n" for line in kept]
+        with open(path + ".tmp", "wb") as f:
+            f.writelines(kept)
+        os.replace(path + ".tmp", path)
+    return done
+
+async def crawl(urls: List[str], out_path: str, concurrency: int = SCRAPE_CONCURRENCY,
+                timeout: Optional[float] = SCRAPE_TIMEOUT,
+                max_products: Optional[int] = MAX_PRODUCTS) -> Dict[str, int]:
+    """Scrape urls into an NDJSON file, one result per line as each store finishes.
+
+    The output file is the checkpoint: stores it already holds a successful
+    result for are skipped, so an interrupted crawl resumes where it stopped.
+    Failed stores are retried on the next run, which replaces their lines,
+    so each store has at most one line.
+    """
+    done = read_checkpoint(out_path)
+    todo = [url for url in urls if url not in done]
+    counts = {"skipped": len(urls) - len(todo), "done": 0, "failed": 0}
+    logger.info(f"Crawling {len(todo)} stores ({counts['skipped']} already in {out_path})")
+    with open(out_path, "ab") as out:
+        async for result in aiter_scrape_many(todo, concurrency, timeout, max_products=max_products):
+            out.write(dumps({key: value for key, value in result.items() if key != FINGERPRINTS_KEY}) + b"\n")
+            out.flush()
+            counts["failed" if "error" in result else "done"] += 1
+            finished = counts["done"] + counts["failed"]
+            if finished % 10 == 0 or finished == len(todo):
+                print(f"{finished}/{len(todo)} stores scraped ({counts['failed']} failed)")
+    return counts
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape Shopify stores from the command line")
+    commands = parser.add_subparsers(dest="command", required=True)
+    crawl_parser = commands.add_parser("crawl", help="scrape every store in a URL list into an NDJSON file")
+    crawl_parser.add_argument("urls", help="text file with one store URL per line")
+    crawl_parser.add_argument("--out", default="results.ndjson", help="NDJSON output, also the resume checkpoint")
+    crawl_parser.add_argument("--concurrency", type=int, default=SCRAPE_CONCURRENCY)
+    crawl_parser.add_argument("--timeout", type=float, default=SCRAPE_TIMEOUT, help="per-store timeout in seconds")
+    crawl_parser.add_argument("--max-products", type=int, default=MAX_PRODUCTS or 0,
+                              help="products per store; 0 crawls the full catalog")
+    crawl_parser.add_argument("--restart", action="store_true", help="ignore and overwrite an existing output file")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.out):
+        os.remove(args.out)
+    counts = run_sync(crawl(read_url_list(args.urls), args.out, args.concurrency, args.timeout,
+                            product_cap(args.max_products)))
+    print(f"✅ Done: {counts['done']} scraped, {counts['failed']} failed, {counts['skipped']} skipped")
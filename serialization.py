@@ -0,0 +1,82 @@
+# serialization.py
+import base64
+import gzip
+import json
+import logging
+import os
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback, same output just slower
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression for stored blobs: "zstd", "gzip" or "none". Blobs shorter than
+# BLOB_COMPRESS_MIN_BYTES are stored as plain JSON either way.
+BLOB_COMPRESSION = os.getenv("BLOB_COMPRESSION", "zstd" if zstandard else "gzip").lower()
+BLOB_COMPRESS_MIN_BYTES = int(os.getenv("BLOB_COMPRESS_MIN_BYTES", "4096"))
+BLOB_COMPRESS_LEVEL = int(os.getenv("BLOB_COMPRESS_LEVEL", "6"))
+
+# Stored values are either plain JSON (what older rows hold) or
+# "<format marker>:" followed by the base64 compressed JSON
+ZSTD_MARKER = "zstd1:"
+GZIP_MARKER = "gzip1:"
+
+if BLOB_COMPRESSION == "zstd" and zstandard is None:
+    logger.warning("BLOB_COMPRESSION=zstd but zstandard is not installed; using gzip")
+    BLOB_COMPRESSION = "gzip"
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """UTF-8 JSON bytes, compact unless pretty"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, option=option, default=str)
+    separators = None if pretty else (",", ":")
+    return json.dumps(obj, ensure_ascii=False, indent=2 if pretty else None,
+                      separators=separators, default=str).encode("utf-8")
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_blob(obj: Any) -> str:
+    """Value for a Text data column: plain JSON, or compressed JSON behind a format marker"""
+    raw = dumps(obj)
+    if len(raw) < BLOB_COMPRESS_MIN_BYTES or BLOB_COMPRESSION == "none":
+        return raw.decode("utf-8")
+    if BLOB_COMPRESSION == "zstd":
+        compressed = zstandard.ZstdCompressor(level=BLOB_COMPRESS_LEVEL).compress(raw)
+        marker = ZSTD_MARKER
+    else:
+        compressed = gzip.compress(raw, compresslevel=BLOB_COMPRESS_LEVEL, mtime=0)
+        marker = GZIP_MARKER
+    return marker + base64.b64encode(compressed).decode("ascii")
+
+
+def decode_blob(value: Optional[str]) -> Any:
+    """Inverse of encode_blob; also reads plain JSON written before compression existed"""
+    if not value:
+        return None
+    if not value.startswith((ZSTD_MARKER, GZIP_MARKER)):
+        return loads(value)
+    try:
+        if value.startswith(ZSTD_MARKER):
+            if zstandard is None:
+                raise RuntimeError("zstandard is not installed")
+            raw = zstandard.ZstdDecompressor().decompress(base64.b64decode(value[len(ZSTD_MARKER):]))
+        else:
+            raw = gzip.decompress(base64.b64decode(value[len(GZIP_MARKER):]))
+    except Exception as e:
+        raise ValueError(f"Cannot decompress stored blob: {e}") from e
+    return loads(raw)
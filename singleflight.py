@@ -0,0 +1,77 @@
+# singleflight.py
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import ScrapeLease
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    The first caller starts the work as a task; callers arriving while it
+    runs await the same task and get the same result (or exception). A
+    caller that is cancelled stops waiting without cancelling the shared work.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            logger.info(f"Joining in-flight call for {key}")
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+# Cross-process leases in the scrape_leases table. A lease is a row owned by
+# one worker until it is released or expires.
+
+def acquire_lease(db: Session, key: str, owner: str, ttl: float) -> bool:
+    """Take the lease for key, or an expired one; False if another owner holds it"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl)
+    try:
+        db.add(ScrapeLease(key=key, owner=owner, expires_at=expires_at))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+    taken = db.execute(
+        update(ScrapeLease)
+        .where(ScrapeLease.key == key, ScrapeLease.expires_at < now)
+        .values(owner=owner, expires_at=expires_at)
+    ).rowcount
+    db.commit()
+    if taken:
+        logger.warning(f"Took over expired lease {key}")
+    return bool(taken)
+
+
+def release_lease(db: Session, key: str, owner: str) -> None:
+    db.rollback()  # the work may have failed mid-transaction
+    db.execute(delete(ScrapeLease).where(ScrapeLease.key == key, ScrapeLease.owner == owner))
+    db.commit()
+
+
+def lease_held(db: Session, key: str) -> bool:
+    """True while an unexpired lease exists for key"""
+    return bool(db.scalar(select(exists().where(
+        ScrapeLease.key == key, ScrapeLease.expires_at >= datetime.utcnow()
+    ))))
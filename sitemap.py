@@ -0,0 +1,167 @@
+# sitemap.py
+import asyncio
+import gzip
+import io
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+from lxml import etree
+from http_client import FetchSession, robots_cache
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds per store, so huge or looping sitemap trees stay cheap
+SITEMAP_MAX_FILES = int(os.getenv("SITEMAP_MAX_FILES", "25"))
+SITEMAP_MAX_URLS = int(os.getenv("SITEMAP_MAX_URLS", "200000"))
+
+# Page categories by keywords in the last path segment, checked in order
+URL_CATEGORIES = [
+    ("privacy_policy", ("privacy",)),
+    ("return_refund_policy", ("refund", "return")),
+    ("faqs", ("faq", "frequently-asked", "questions")),
+    ("about_brand", ("about", "our-story", "who-we-are")),
+    ("contact_us", ("contact",)),
+    ("shipping", ("shipping", "delivery")),
+    ("order_tracking", ("track",)),
+    ("size_guide", ("size-guide", "sizing", "size-chart", "fit-guide")),
+]
+# Catalog and blog URLs are never content pages
+_SKIPPED_SEGMENTS = frozenset(["products", "collections", "blogs", "cart", "account", "search"])
+
+_PRODUCT_PATH = re.compile(r"/products/([^/?#]+)")
+
+
+@dataclass
+class SitemapDiscovery:
+    """What a store's sitemaps say about it"""
+    found: bool = False  # at least one sitemap was read
+    pages_listed: bool = False  # a sitemap of content pages was read, so unlisted pages likely do not exist
+    pages: Dict[str, List[str]] = field(default_factory=dict)  # category -> URLs in sitemap order
+    product_sitemaps: List[str] = field(default_factory=list)  # read on demand by product_lastmods()
+
+
+def iter_sitemap(content: bytes) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """Stream (kind, loc, lastmod) entries out of a sitemap or sitemap index.
+
+    kind is "sitemap" for index entries and "url" for pages. Elements are
+    cleared as they are read, so memory stays flat on 50k-entry files.
+    """
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+    context = etree.iterparse(io.BytesIO(content), events=("end",), recover=True,
+                              resolve_entities=False, no_network=True, huge_tree=True)
+    try:
+        for _, element in context:
+            tag = etree.QName(element).localname if isinstance(element.tag, str) else ""
+            if tag in ("url", "sitemap"):
+                loc = lastmod = None
+                for child in element:
+                    if not isinstance(child.tag, str):
+                        continue
+                    name = etree.QName(child).localname
+                    if name == "loc" and child.text:
+                        loc = child.text.strip()
+                    elif name == "lastmod" and child.text:
+                        lastmod = child.text.strip()
+                if loc:
+                    yield tag, loc, lastmod
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+    except etree.XMLSyntaxError as e:
+        logger.warning(f"Malformed sitemap: {e}")
+
+
+def classify_url(url: str) -> Optional[str]:
+    """Page category (see URL_CATEGORIES) of a content page URL, or None"""
+    segments = [s for s in urlparse(url).path.lower().split("/") if s]
+    if not segments or _SKIPPED_SEGMENTS.intersection(segments):
+        return None
+    last = segments[-1]
+    for category, keywords in URL_CATEGORIES:
+        if any(keyword in last for keyword in keywords):
+            return category
+    return None
+
+
+def _sitemap_kind(url: str) -> str:
+    """Shopify names child sitemaps sitemap_<kind>_1.xml"""
+    name = urlparse(url).path.rsplit("/", 1)[-1].lower()
+    for kind in ("products", "pages", "collections", "blogs"):
+        if kind in name:
+            return kind
+    return "other"
+
+
+async def _fetch(session: FetchSession, url: str) -> Optional[bytes]:
+    try:
+        r = await session.get(url)
+    except Exception as e:
+        logger.info(f"Could not fetch {url}: {e}")
+        return None
+    return r.content if r.status_code == 200 else None
+
+
+async def discover_sitemaps(session: FetchSession, domain: str) -> SitemapDiscovery:
+    """Read robots.txt and the sitemap tree and classify the content pages it lists.
+
+    Product sitemaps are only recorded; product_lastmods() reads them when
+    they are needed. Collection and blog sitemaps are skipped.
+    """
+    discovery = SitemapDiscovery()
+    # robots.txt comes from the shared cache the request scheduler also reads
+    robots, root = await asyncio.gather(robots_cache.aload(domain), _fetch(session, f"{domain}/sitemap.xml"))
+    declared = [urljoin(domain, url.strip()) for url in robots.site_maps() or []]
+    pending = [f"{domain}/sitemap.xml"] + [url for url in declared if url != f"{domain}/sitemap.xml"]
+    fetched = {f"{domain}/sitemap.xml": root}
+    seen = set()
+    urls = 0
+    while pending and len(seen) < SITEMAP_MAX_FILES:
+        batch = [url for url in dict.fromkeys(pending) if url not in seen][:SITEMAP_MAX_FILES - len(seen)]
+        pending = []
+        seen.update(batch)
+        contents = await asyncio.gather(*(
+            asyncio.sleep(0, fetched[url]) if url in fetched else _fetch(session, url) for url in batch
+        ))
+        for url, content in zip(batch, contents):
+            if not content:
+                continue
+            discovery.found = True
+            if _sitemap_kind(url) == "pages":
+                discovery.pages_listed = True
+            for kind, loc, _ in iter_sitemap(content):
+                loc = urljoin(url, loc)
+                if kind == "sitemap":
+                    child_kind = _sitemap_kind(loc)
+                    if child_kind == "products":
+                        discovery.product_sitemaps.append(loc)
+                    elif child_kind not in ("collections", "blogs") and loc not in seen:
+                        pending.append(loc)
+                    continue
+                urls += 1
+                if urls > SITEMAP_MAX_URLS:
+                    break
+                category = classify_url(loc)
+                if category and loc not in discovery.pages.setdefault(category, []):
+                    discovery.pages[category].append(loc)
+    if discovery.found:
+        logger.info(f"Sitemap: {sum(len(v) for v in discovery.pages.values())} classified pages, "
+                    f"{len(discovery.product_sitemaps)} product sitemaps")
+    return discovery
+
+
+async def product_lastmods(session: FetchSession, product_sitemaps: List[str]) -> Dict[str, str]:
+    """{product handle: lastmod} from the product sitemaps"""
+    lastmods = {}
+    contents = await asyncio.gather(*(_fetch(session, url) for url in product_sitemaps[:SITEMAP_MAX_FILES]))
+    for content in contents:
+        if not content:
+            continue
+        for kind, loc, lastmod in iter_sitemap(content):
+            match = _PRODUCT_PATH.search(urlparse(loc).path) if kind == "url" else None
+            if match:
+                lastmods[match.group(1)] = lastmod or ""
+    return lastmods
@@ -0,0 +1,121 @@
+# structured_data.py
+"""Read FAQs, social links, contacts and the brand name from structured data
+(JSON-LD, schema.org microdata and <details> accordions) collected by html_extract.
+
+Everything here is a local parse; the scraper only calls the LLM for a
+section when nothing structured was found for it.
+"""
+import html
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from html_extract import PageExtract, clean_text, social_platform
+from llm_processor import validate_faq_list
+
+# Node types that describe the store itself
+ORGANIZATION_TYPES = frozenset(["organization", "corporation", "onlinestore", "store", "localbusiness", "brand"])
+
+MAX_DEPTH = 20
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def iter_nodes(value: Any, depth: int = 0) -> Iterator[dict]:
+    """Every JSON object in a JSON-LD document, including nested ones and @graph members"""
+    if depth > MAX_DEPTH:
+        return
+    if isinstance(value, dict):
+        yield value
+        for child in value.values():
+            if isinstance(child, (dict, list)):
+                yield from iter_nodes(child, depth + 1)
+    elif isinstance(value, list):
+        for child in value:
+            yield from iter_nodes(child, depth + 1)
+
+
+def node_types(node: dict) -> set:
+    types = node.get("@type") or []
+    if isinstance(types, str):
+        types = [types]
+    return {str(t).rsplit("/", 1)[-1].lower() for t in types}
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _plain_text(value: Any) -> str:
+    """Text of a schema.org value that may be an object, a list or contain HTML"""
+    if isinstance(value, list):
+        value = value[0] if value else ""
+    if isinstance(value, dict):
+        value = value.get("text") or value.get("name") or ""
+    return clean_text(html.unescape(_TAG_RE.sub(" ", str(value))))
+
+
+def faqs_from_page(page: PageExtract) -> List[Dict[str, str]]:
+    """FAQs from JSON-LD Question nodes, microdata Questions and question-like <details>"""
+    faqs = []
+    for node in iter_nodes(page.json_ld):
+        if "question" in node_types(node):
+            answer = node.get("acceptedAnswer") or node.get("suggestedAnswer")
+            faqs.append({"question": _plain_text(node.get("name") or node.get("text")),
+                         "answer": _plain_text(answer)})
+    faqs.extend(page.microdata_faqs)
+    # Themes also use <details> for filters and menus; only questions count as FAQs
+    faqs.extend({"question": q, "answer": a} for q, a in page.accordions if q.endswith("?"))
+
+    seen = set()
+    unique = []
+    for faq in faqs:
+        key = faq["question"].lower()
+        if key not in seen:
+            seen.add(key)
+            unique.append(faq)
+    return validate_faq_list(unique)
+
+
+def _organizations(page: PageExtract) -> Iterator[dict]:
+    for node in iter_nodes(page.json_ld):
+        if node_types(node) & ORGANIZATION_TYPES:
+            yield node
+
+
+def socials_from_page(page: PageExtract) -> List[Dict[str, str]]:
+    """Social profiles listed in the store's Organization sameAs"""
+    socials = []
+    for node in _organizations(page):
+        for url in _as_list(node.get("sameAs")):
+            if isinstance(url, str):
+                platform = social_platform(url)
+                if platform:
+                    socials.append({"platform": platform, "url": url})
+    return socials
+
+
+def contacts_from_page(page: PageExtract) -> Tuple[List[str], List[str]]:
+    """(emails, phones) from the store's Organization and its contactPoint entries"""
+    emails, phones = [], []
+    for node in _organizations(page):
+        for entry in [node] + [p for p in _as_list(node.get("contactPoint")) if isinstance(p, dict)]:
+            for email in _as_list(entry.get("email")):
+                email = str(email).strip()
+                if email.lower().startswith("mailto:"):
+                    email = email[len("mailto:"):]
+                if email and email not in emails:
+                    emails.append(email)
+            for phone in _as_list(entry.get("telephone")):
+                phone = str(phone).strip()
+                if phone and phone not in phones:
+                    phones.append(phone)
+    return emails, phones
+
+
+def organization_name(page: PageExtract) -> Optional[str]:
+    for node in _organizations(page):
+        name = node.get("name")
+        if isinstance(name, str) and name.strip():
+            return name.strip()
+    return None
@@ -0,0 +1,61 @@
+# tests/conftest.py
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Tests run against a local store and a throwaway SQLite database; keep the on-disk caches out of it
+os.environ.setdefault("HTTP_CACHE_ENABLED", "0")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+
+TEXT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20
+PRODUCTS = [
+    {"id": i, "title": f"Product {i}", "handle": f"product-{i}", "updated_at": "2024-01-01",
+     "variants": [{"price": "10.00"}], "images": []}
+    for i in range(1, 9)
+]
+PAGES = {
+    "/": '<html><head><title>Test Shop</title></head><body>'
+         '<a href="/policies/privacy-policy">Privacy policy</a>'
+         '<a href="/policies/refund-policy">Refund policy</a>'
+         '<a href="/products/product-8">Featured</a>'
+         '<a href="/pages/faq">FAQ</a><a href="/pages/about-us">About us</a></body></html>',
+    "/policies/privacy-policy": f"<html><body><p>Privacy. {TEXT}</p></body></html>",
+    "/policies/refund-policy": f"<html><body><p>Refunds. {TEXT}</p></body></html>",
+    "/pages/faq": f"<html><body><p>Questions. {TEXT}</p></body></html>",
+    "/pages/about-us": f"<html><body><p>Our story. {TEXT}</p></body></html>",
+}
+
+
+class StoreHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/products.json":
+            page = 1 if "page=" not in self.path else int(self.path.split("page=")[1].split("&")[0])
+            body, content_type = json.dumps({"products": PRODUCTS if page == 1 else []}).encode(), "application/json"
+        elif path in PAGES:
+            body, content_type = PAGES[path].encode(), "text/html"
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def store_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StoreHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
@@ -0,0 +1,53 @@
+# tests/test_app.py
+import asyncio
+import json
+
+from sqlalchemy import select
+
+import app
+from database import AsyncSessionLocal, BrandData, SessionLocal, async_engine
+from serialization import GZIP_MARKER, encode_blob
+
+
+def test_project_data_marks_undecodable_blobs():
+    stored = encode_blob({"brand_name": "Acme", "products": [{"id": 1}], "_fingerprints": {}})
+
+    assert app.project_data(stored, None, "https://acme.test") == {"brand_name": "Acme", "products": [{"id": 1}]}
+    assert app.project_data(stored, ["product_count"], "https://acme.test") == {"product_count": 1}
+    for broken in ("{not json", GZIP_MARKER + "bm90IGd6aXA="):
+        assert app.project_data(broken, None, "https://acme.test") == {"error": "Stored data could not be decoded"}
+
+
+def test_list_response_pages_with_cursor():
+    websites = [f"https://paging-{i}.test" for i in range(5)]
+    db = SessionLocal()
+    try:
+        db.add_all(BrandData(website=website, data="{}") for website in websites)
+        db.commit()
+    finally:
+        db.close()
+    stmt = select(BrandData).where(BrandData.website.like("https://paging-%"))
+
+    def serialize(brand):
+        return brand.website
+
+    async def pages():
+        seen, after_id = [], 0
+        try:
+            async with AsyncSessionLocal() as db:
+                while True:
+                    response = await app.list_response(stmt, BrandData.id, serialize, 2, after_id, "json", db)
+                    seen.append(json.loads(response.body))
+                    if app.NEXT_CURSOR_HEADER not in response.headers:
+                        break
+                    after_id = int(response.headers[app.NEXT_CURSOR_HEADER])
+                response = await app.list_response(stmt, BrandData.id, serialize, None, 0, "ndjson", db)
+                streamed = [json.loads(line) async for line in response.body_iterator]
+            return seen, streamed
+        finally:
+            await async_engine.dispose()
+
+    seen, streamed = asyncio.run(pages())
+
+    assert seen == [websites[:2], websites[2:4], websites[4:]]
+    assert streamed == websites
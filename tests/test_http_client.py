@@ -0,0 +1,37 @@
+# tests/test_http_client.py
+import time
+from email.utils import formatdate
+
+import httpx
+
+import http_client
+from http_client import parse_retry_after, retry_delay
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after("soon") is None
+    assert 55 <= parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0.0
+
+
+def test_retry_delay(monkeypatch):
+    monkeypatch.setattr(http_client, "MAX_RETRIES", 3)
+    monkeypatch.setattr(http_client, "BACKOFF_BASE", 0.5)
+    monkeypatch.setattr(http_client, "BACKOFF_MAX", 1.5)
+    monkeypatch.setattr(http_client, "RETRY_AFTER_MAX", 60)
+
+    assert retry_delay(3) is None
+    for attempt in range(3):
+        assert 0 <= retry_delay(attempt) <= min(1.5, 0.5 * 2 ** attempt)
+
+    def response(retry_after: str) -> httpx.Response:
+        return httpx.Response(429, headers={"Retry-After": retry_after})
+
+    assert retry_delay(0, response("7")) == 7.0
+    assert retry_delay(0, response("600")) is None  # longer than we are willing to wait
+    assert 0 <= retry_delay(0, response("later")) <= 0.5
+    assert retry_delay(3, response("1")) is None
@@ -0,0 +1,63 @@
+# tests/test_incremental.py
+import scraper
+
+
+def fake_llm(monkeypatch, healthy: bool) -> list:
+    """Replace the LLM section processors; returns the list of sections processed"""
+    calls = []
+
+    async def clean_policy(text):
+        calls.append("policy")
+        return "A cleaned policy that is long enough to keep." if healthy else "Error processing policy text."
+
+    async def extract_faqs(text):
+        calls.append("faqs")
+        return [{"question": "Do you ship abroad?", "answer": "Yes, worldwide."}] if healthy else []
+
+    async def summarize_about(text):
+        calls.append("about_brand")
+        return "A brand summary that is long enough to keep." if healthy else "Error processing brand information."
+
+    monkeypatch.setattr(scraper.llm_processor, "LLM_BATCH_MODE", False)
+    monkeypatch.setattr(scraper, "aclean_policy_text", clean_policy)
+    monkeypatch.setattr(scraper, "aextract_faqs", extract_faqs)
+    monkeypatch.setattr(scraper, "asummarize_about_text", summarize_about)
+    return calls
+
+
+def test_failed_sections_are_processed_again(store_url, monkeypatch):
+    fake_llm(monkeypatch, healthy=False)
+    failed = scraper.scrape_shopify_store(store_url)
+    assert failed["privacy_policy"]["content"] == "Error processing policy text."
+
+    calls = fake_llm(monkeypatch, healthy=True)
+    recovered = scraper.scrape_shopify_store(store_url, previous=failed)
+
+    assert sorted(calls) == ["about_brand", "faqs", "policy", "policy"]
+    assert recovered["privacy_policy"]["content"] == "A cleaned policy that is long enough to keep."
+    assert recovered["return_refund_policy"]["content"] == "A cleaned policy that is long enough to keep."
+    assert recovered["faqs"] == [{"question": "Do you ship abroad?", "answer": "Yes, worldwide."}]
+    assert recovered["about_brand"] == "A brand summary that is long enough to keep."
+
+
+def test_unchanged_sections_are_reused(store_url, monkeypatch):
+    fake_llm(monkeypatch, healthy=True)
+    first = scraper.scrape_shopify_store(store_url)
+
+    calls = fake_llm(monkeypatch, healthy=True)
+    second = scraper.scrape_shopify_store(store_url, previous=first)
+
+    assert calls == []
+    assert second["about_brand"] == first["about_brand"]
+    assert second["faqs"] == first["faqs"]
+
+
+def test_prompt_change_reprocesses_sections(store_url, monkeypatch):
+    fake_llm(monkeypatch, healthy=True)
+    first = scraper.scrape_shopify_store(store_url)
+
+    calls = fake_llm(monkeypatch, healthy=True)
+    monkeypatch.setitem(scraper.llm_processor.PROMPT_VERSIONS, "extract_faqs", "2")
+    scraper.scrape_shopify_store(store_url, previous=first)
+
+    assert sorted(calls) == ["about_brand", "faqs", "policy", "policy"]
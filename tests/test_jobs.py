@@ -0,0 +1,78 @@
+# tests/test_jobs.py
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import jobs
+from database import SessionLocal, ScrapeJob
+
+
+def add_job(status: str, updated_at: datetime) -> str:
+    db = SessionLocal()
+    try:
+        job_id = uuid.uuid4().hex
+        db.add(ScrapeJob(id=job_id, website="https://orphan.example.com", status=status, progress="{}",
+                         created_at=updated_at, updated_at=updated_at))
+        db.commit()
+        return job_id
+    finally:
+        db.close()
+
+
+def job_status(job_id: str) -> str:
+    db = SessionLocal()
+    try:
+        return db.get(ScrapeJob, job_id).status
+    finally:
+        db.close()
+
+
+def wait_for(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_worker_loop_requeues_orphaned_job(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_INTERVAL", 0.1)
+    monkeypatch.setattr(jobs, "JOB_STALE_AFTER", 1)
+    ran = []
+    monkeypatch.setattr(jobs, "run_job", ran.append)
+
+    pool = jobs.JobWorkerPool(size=1, poll_interval=0.05)
+    pool.start()
+    try:
+        # Orphaned after the pool started, as when another worker process dies mid-job
+        orphan = add_job("running", datetime.utcnow() - timedelta(seconds=30))
+        fresh = add_job("running", datetime.utcnow())
+        assert wait_for(lambda: orphan in ran)
+    finally:
+        pool.stop()
+    assert fresh not in ran
+    assert job_status(fresh) == "running"
+
+
+def test_running_job_heartbeat_keeps_it_claimed(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_INTERVAL", 0.05)
+    monkeypatch.setattr(jobs, "JOB_STALE_AFTER", 0.5)
+
+    statuses = []
+
+    def slow_build(website_url, include_competitors, db, progress=None):
+        time.sleep(1)  # longer than JOB_STALE_AFTER, without progress updates
+        db_check = SessionLocal()
+        try:
+            jobs.requeue_stale_jobs(db_check)
+        finally:
+            db_check.close()
+        statuses.append(job_status(job_id))
+        return {"brand": {}}
+
+    monkeypatch.setattr(jobs, "build_insights", slow_build)
+    job_id = add_job("running", datetime.utcnow())
+    jobs.run_job(job_id)
+    assert statuses == ["running"]
+    assert job_status(job_id) == "done"
@@ -0,0 +1,17 @@
+# tests/test_llm_cache.py
+from llm_cache import LLMCache
+
+
+def test_entry_count_tracks_writes_and_evictions(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"), max_entries=3, ttl=3600)
+    for i in range(5):
+        cache.set(f"key{i}", i)
+    cache.set("key4", "updated")
+
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["evictions"] == 2
+    assert cache.get("key0") is None
+    assert cache.get("key4") == "updated"
+
+    reopened = LLMCache(cache.path, max_entries=3, ttl=3600)
+    assert reopened.stats()["entries"] == 3
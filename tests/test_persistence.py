@@ -0,0 +1,43 @@
+# tests/test_persistence.py
+from sqlalchemy import Column, Integer, String, UniqueConstraint, create_engine, select
+from sqlalchemy.orm import Session, declarative_base
+
+import persistence
+from persistence import upsert_rows
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+    __table_args__ = (UniqueConstraint("owner", "name"),)
+    id = Column(Integer, primary_key=True)
+    owner = Column(String(50))
+    name = Column(String(50))
+    price = Column(Integer)
+
+
+def items(db: Session) -> list:
+    return [(item.owner, item.name, item.price) for item in db.scalars(select(Item).order_by(Item.id))]
+
+
+def test_upsert_rows_on_sqlite(monkeypatch):
+    monkeypatch.setattr(persistence, "UPSERT_CHUNK_SIZE", 2)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        rows = [{"owner": "a", "name": f"item{i}", "price": i} for i in range(3)]
+        upsert_rows(db, Item, rows, ("owner", "name"))
+        db.commit()
+        assert items(db) == [("a", "item0", 0), ("a", "item1", 1), ("a", "item2", 2)]
+
+        # Without update columns existing rows are left alone
+        upsert_rows(db, Item, [{"owner": "a", "name": "item0", "price": 10}], ("owner", "name"))
+        db.commit()
+        assert items(db)[0] == ("a", "item0", 0)
+
+        upsert_rows(db, Item, [{"owner": "a", "name": "item1", "price": 11}, {"owner": "b", "name": "item1", "price": 1}],
+                    ("owner", "name"), update_columns=("price",))
+        upsert_rows(db, Item, [], ("owner", "name"))
+        db.commit()
+        assert items(db) == [("a", "item0", 0), ("a", "item1", 11), ("a", "item2", 2), ("b", "item1", 1)]
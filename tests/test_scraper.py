@@ -0,0 +1,47 @@
+# tests/test_scraper.py
+import gc
+import json
+import warnings
+
+import scraper
+from conftest import PRODUCTS
+
+
+def test_unreachable_store_leaves_no_pending_work():
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        result = scraper.scrape_shopify_store("http://127.0.0.1:1")
+        gc.collect()
+
+    assert result["error"].startswith("Unable to connect")
+    assert not [w for w in caught if "never awaited" in str(w.message)]
+
+
+def test_zero_product_cap_crawls_full_catalog(store_url):
+    assert scraper.product_cap("0") is None
+    assert scraper.product_cap("") is None
+    assert scraper.product_cap(3) == 3
+    assert len(list(scraper.iter_catalog(store_url, max_products=0))) == len(PRODUCTS)
+    assert len(list(scraper.iter_catalog(store_url, max_products=3))) == 3
+
+    result = scraper.scrape_shopify_store(store_url, max_products=0)
+    assert len(result["products"]) == len(PRODUCTS)
+
+
+def test_crawl_resume_keeps_one_line_per_store(store_url, tmp_path):
+    out = str(tmp_path / "results.ndjson")
+    dead_store = "http://127.0.0.1:1"
+    urls = [store_url, dead_store]
+
+    first = scraper.run_sync(scraper.crawl(urls, out))
+    assert (first["done"], first["failed"]) == (1, 1)
+    with open(out, "ab") as f:
+        f.write(b'{"website": "' + dead_store.encode() + b'", "brand')  # cut short by an interrupted run
+
+    second = scraper.run_sync(scraper.crawl(urls, out))
+    assert (second["skipped"], second["done"], second["failed"]) == (1, 0, 1)
+
+    with open(out, encoding="utf-8") as f:
+        results = [json.loads(line) for line in f]
+    assert sorted(result["website"] for result in results) == sorted(urls)
+    assert scraper.read_checkpoint(out) == {store_url}
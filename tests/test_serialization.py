@@ -0,0 +1,35 @@
+# tests/test_serialization.py
+import pytest
+
+import serialization
+from serialization import GZIP_MARKER, ZSTD_MARKER, decode_blob, encode_blob
+
+DATA = {"brand_name": "Acme", "products": [{"id": i, "title": f"Product {i}"} for i in range(200)]}
+
+
+def test_small_and_legacy_blobs_are_plain_json():
+    assert encode_blob({"a": 1}) == '{"a":1}'
+    assert decode_blob('{"a": 1}') == {"a": 1}
+    assert decode_blob(None) is None
+
+
+def test_gzip_round_trip(monkeypatch):
+    monkeypatch.setattr(serialization, "BLOB_COMPRESSION", "gzip")
+    stored = encode_blob(DATA)
+
+    assert stored.startswith(GZIP_MARKER)
+    assert decode_blob(stored) == DATA
+
+
+def test_zstd_round_trip(monkeypatch):
+    pytest.importorskip("zstandard")
+    monkeypatch.setattr(serialization, "BLOB_COMPRESSION", "zstd")
+    stored = encode_blob(DATA)
+
+    assert stored.startswith(ZSTD_MARKER)
+    assert decode_blob(stored) == DATA
+
+
+def test_corrupt_blob_raises_value_error():
+    with pytest.raises(ValueError):
+        decode_blob(GZIP_MARKER + "bm90IGd6aXA=")
@@ -0,0 +1,61 @@
+# tests/test_singleflight.py
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value
+
+    async def main():
+        results = await asyncio.gather(*(flights.run("key", lambda: work(len(calls))) for _ in range(5)))
+        assert flights.in_flight() == 0
+        return results, await flights.run("key", lambda: work("again"))
+
+    results, later = asyncio.run(main())
+
+    assert results == [0] * 5
+    assert later == "again"  # a finished call is not cached
+    assert calls == [0, "again"]
+
+
+def test_errors_reach_every_caller():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        return await asyncio.gather(flights.run("key", fail), flights.run("key", fail), return_exceptions=True)
+
+    errors = asyncio.run(main())
+
+    assert [str(error) for error in errors] == ["boom", "boom"]
+
+
+def test_cancelled_caller_leaves_shared_work_running():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flights.run("key", work))
+        second = asyncio.ensure_future(flights.run("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
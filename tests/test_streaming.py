@@ -0,0 +1,63 @@
+# tests/test_streaming.py
+import asyncio
+
+import scraper
+
+
+def test_streamed_sections_match_final_result(store_url, monkeypatch):
+    async def clean_policy(text):
+        return "A cleaned policy that is long enough to keep."
+
+    async def extract_faqs(text):
+        return [{"question": "Do you ship?", "answer": "Yes."}, {"question": "do you ship?", "answer": "Yes!"}]
+
+    async def summarize_about(text):
+        return "A brand summary that is long enough to keep."
+
+    monkeypatch.setattr(scraper.llm_processor, "LLM_BATCH_MODE", False)
+    monkeypatch.setattr(scraper, "aclean_policy_text", clean_policy)
+    monkeypatch.setattr(scraper, "aextract_faqs", extract_faqs)
+    monkeypatch.setattr(scraper, "asummarize_about_text", summarize_about)
+
+    streamed = {}
+    result = asyncio.run(scraper.async_scrape_shopify_store(
+        store_url, on_section=lambda section, value: streamed.setdefault(section, value)))
+
+    assert len(result["faqs"]) == 1
+    assert len(result["hero_products"]) == 6
+    for section, value in streamed.items():
+        assert value == result[section], section
+
+
+def test_concurrent_streams_share_one_scrape(store_url, monkeypatch):
+    import database
+    import insights
+    from test_incremental import fake_llm
+
+    fake_llm(monkeypatch, healthy=True)
+    builds = []
+    build = insights.abuild_insights
+
+    async def counting_build(*args, **kwargs):
+        builds.append(args[0])
+        return await build(*args, **kwargs)
+
+    monkeypatch.setattr(insights, "abuild_insights", counting_build)
+
+    async def collect():
+        return [event async for event in insights.aiter_insights_events(store_url, False, incremental=False)]
+
+    async def main():
+        try:
+            return await asyncio.gather(collect(), collect())
+        finally:
+            # Pooled aiosqlite connections belong to this loop
+            await database.async_engine.dispose()
+
+    first, second = asyncio.run(main())
+
+    assert len(builds) == 1
+    for events in (first, second):
+        assert events[-1]["event"] == "result"
+        sections = {event["section"] for event in events if event["event"] == "section"}
+        assert {"brand_name", "products", "faqs"} <= sections